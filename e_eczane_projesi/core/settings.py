@@ -87,6 +87,34 @@ DATABASES = {
     }
 }
 
+# Önbellek (ürün kartları, kategori menüsü vb.)
+# Harici bir sunucu gerekmiyor. Tek süreçte locmem yeterli; birden fazla worker
+# (gunicorn vb.) çalışıyorsa sürüm sayaçları paylaşılsın diye dosya tabanlı önbelleği açın.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'e-eczane',
+    },
+    # 'default': {
+    #     'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    #     'LOCATION': BASE_DIR / 'cache',
+    # },
+}
+
+# E-posta (sipariş onayı, run_jobs işçisi gönderiyor). Geliştirmede konsola yazılır;
+# canlıda SMTP ayarlarıyla değiştirin.
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'E-Eczane <siparis@e-eczane.local>'
+
+# Güvenlik logları tamponlu yazılır (bkz. store/audit.py): BATCH_SIZE olay birikince ya da
+# FLUSH_INTERVAL_MS geçince tek INSERT. SPOOL_DIR verilirse olaylar önce diske (fsync) yazılır,
+# süreç çökse de kaybolmaz.
+AUDIT_LOG = {
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL_MS': 1000,
+    'SPOOL_DIR': None,  # ör. BASE_DIR / 'audit_spool'
+}
+
 # settings.py EN ALTI
 
 JAZZMIN_SETTINGS = {
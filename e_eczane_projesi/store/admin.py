@@ -1,5 +1,13 @@
+from datetime import timedelta
+
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem, Order, OrderItem, UserActivityLog, Review
+from django.db.models import Sum
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from .models import Category, Product, Cart, CartItem, Order, OrderItem, UserActivityLog, Review, StockReservation, Job
+from .models import CategorySalesDaily, ProductSalesDaily, RollupCheckpoint
+from .rollups import SALES_CHECKPOINT
 
 # 1. Kategoriler
 @admin.register(Category)
@@ -10,7 +18,7 @@ class CategoryAdmin(admin.ModelAdmin):
 # 2. Ürünler (Resim önizlemeli olabilir ama şimdilik temel bilgiler)
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'price', 'stock', 'is_active')
+    list_display = ('name', 'category', 'price', 'stock', 'reserved', 'is_active')
     list_filter = ('category', 'is_active')
     search_fields = ('name', 'description')
     list_editable = ('price', 'stock', 'is_active') # Listeden direkt düzenleme imkanı!
@@ -51,4 +59,81 @@ class ReviewAdmin(admin.ModelAdmin):
     list_editable = ('status',) # Yorumu hızlıca onayla/reddet
 
 admin.site.register(Cart)
-# CartItem genelde admin panelinde çok kurcalanmaz ama eklenebilir.
\ No newline at end of file
+# CartItem genelde admin panelinde çok kurcalanmaz ama eklenebilir.
+# 6. Stok Rezervasyonları (sadece izleme; sayaçlar kodla yönetiliyor)
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'cart', 'quantity', 'expires_at')
+    list_select_related = ('product', 'cart')
+    ordering = ('expires_at',)
+
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# 7. Arka Plan İşleri (kuyruk izleme; başarısız işi tekrar denemek için)
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('name', 'payload', 'dedupe_key', 'attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry_jobs']
+
+    @admin.action(description="Seçili işleri tekrar kuyruğa al")
+    def retry_jobs(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, attempts=0, run_at=timezone.now(), locked_by='', locked_at=None,
+        )
+
+
+# 8. Satış Raporu (sadece günlük özet tablolarını okur; ham sipariş satırlarına inmez)
+# Özetleri güncellemek için: python manage.py refresh_sales_rollups
+@admin.register(ProductSalesDaily)
+class SalesDashboardAdmin(admin.ModelAdmin):
+    PERIODS = (7, 30, 90, 365)
+    TOP_PRODUCTS = 20
+
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            period = int(request.GET.get('days', 30))
+        except ValueError:
+            period = 30
+        if period not in self.PERIODS:
+            period = 30
+        since = timezone.localdate() - timedelta(days=period - 1)
+
+        categories = CategorySalesDaily.objects.filter(day__gte=since)
+        totals = categories.aggregate(units=Sum('units'), revenue=Sum('revenue'))
+        daily = categories.values('day').order_by('-day').annotate(units=Sum('units'), revenue=Sum('revenue'))
+        by_category = (
+            categories.values('category__name').order_by().annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue')
+        )
+        by_product = (
+            ProductSalesDaily.objects.filter(day__gte=since).values('product_id', 'product__name').order_by()
+            .annotate(units=Sum('units'), revenue=Sum('revenue'), buyer_days=Sum('buyers'))
+            .order_by('-revenue')[:self.TOP_PRODUCTS]
+        )
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Satış Raporu',
+            'opts': self.model._meta,
+            'periods': self.PERIODS,
+            'period': period,
+            'totals': totals,
+            'daily': daily,
+            'by_category': by_category,
+            'by_product': by_product,
+            'checkpoint': RollupCheckpoint.objects.filter(name=SALES_CHECKPOINT).first(),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/store/sales_dashboard.html', context)
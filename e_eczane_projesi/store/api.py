@@ -0,0 +1,156 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import slug_re
+from django.db.models import Count, F, Max
+from django.db.models.functions import Greatest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition, require_safe
+
+from .cache import CATEGORY_VERSION, FRAGMENT_TIMEOUT, PRODUCT_DATA_VERSION, get_versions, product_version_name
+from .models import Category, Product
+
+# Salt okunur JSON katalog API'si (mobil uygulama, fiyat karşılaştırma botları).
+# Her kapsam (tüm ürünler, bir kategori, tek ürün, kategoriler) için doğrulayıcı:
+# max(updated_at) + satır sayısı (silinen satır max'ı değiştirmez ama sayıyı değiştirir).
+# Bu aggregate kapsamın tüm satırlarını taradığı için sonucu sürüm sayaçlarıyla anahtarlanmış
+# olarak önbellekte tutuyoruz (bkz. store/cache.py); sayaç artana kadar doğrulama tek önbellek
+# okuması. İstemci If-None-Match / If-Modified-Since gönderirse ve değişiklik yoksa 304 dönüyoruz.
+
+STREAM_CHUNK_SIZE = 500
+
+API_STATE_KEY = 'store:api:{}:{}'
+
+PRODUCT_API_FIELDS = (
+    'id', 'name', 'slug', 'price', 'stock', 'image', 'rating_avg', 'rating_count', 'updated_at',
+)
+
+
+def _scope_state(request, key, versions, queryset, modified='updated_at'):
+    # condition() ETag ve Last-Modified'ı ayrı ayrı soruyor; aynı istekte tek okuma yeter
+    validators = request.__dict__.setdefault('_api_validators', {})
+    if key not in validators:
+        cache_key = API_STATE_KEY.format(key, '-'.join(str(version) for version in get_versions(*versions).values()))
+        state = cache.get(cache_key)
+        if state is None:
+            state = queryset.aggregate(last_modified=Max(modified), count=Count('id'))
+            cache.set(cache_key, state, FRAGMENT_TIMEOUT)
+        validators[key] = state
+    return validators[key]
+
+
+# Ürün çıktısında kategori slug'ı da var; kategori değişince ürün kapsamı da değişmiş sayılır
+PRODUCT_MODIFIED = Greatest('updated_at', 'category__updated_at')
+
+
+def _etag(key, state):
+    if state['last_modified'] is None and key.startswith('product:'):
+        return None  # Ürün yok -> 404
+    stamp = state['last_modified'].timestamp() if state['last_modified'] else 0
+    return f'"{key}-{state["count"]}-{stamp:.6f}"'
+
+
+# --- Kapsamlar ---
+def _products_scope(request):
+    products = Product.objects.filter(is_active=True)
+    category_slug = request.GET.get('category')
+    if not category_slug:
+        return 'products:*', products
+    # Slug olamayacak değer (satır sonu, tırnak, ASCII dışı) 404; geçerli slug da anahtara ve ETag'e
+    # ham değil özet olarak girer
+    if not slug_re.fullmatch(category_slug):
+        raise Http404
+    digest = hashlib.md5(category_slug.encode()).hexdigest()
+    return f'products:{digest}', products.filter(category__slug=category_slug)
+
+
+def _products_state(request):
+    key, products = _products_scope(request)
+    versions = (PRODUCT_DATA_VERSION, CATEGORY_VERSION)
+    return key, _scope_state(request, key, versions, products, PRODUCT_MODIFIED)
+
+
+def _product_state(request, product_id):
+    key = f'product:{product_id}'
+    versions = (product_version_name(product_id), CATEGORY_VERSION)
+    products = Product.objects.filter(pk=product_id, is_active=True)
+    return key, _scope_state(request, key, versions, products, PRODUCT_MODIFIED)
+
+
+def _categories_state(request):
+    return 'categories', _scope_state(request, 'categories', (CATEGORY_VERSION,), Category.objects.all())
+
+
+def _serialize_product(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'slug': row['slug'],
+        'category': row['category_slug'],
+        'url': reverse('product_detail', args=[row['category_slug'], row['slug']]),
+        'price': row['price'],
+        'stock': row['stock'],
+        # Sepetlerde ayrılmış adetler satılamaz
+        'in_stock': row['stock'] - row['reserved'] > 0,
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'rating': {'average': row['rating_avg'], 'count': row['rating_count']},
+        'updated_at': row['updated_at'],
+    }
+
+
+def _product_rows(queryset, *extra_fields):
+    return queryset.annotate(category_slug=F('category__slug')).values(
+        *PRODUCT_API_FIELDS, *extra_fields, 'reserved', 'category_slug',
+    )
+
+
+# 1. Ürün listesi (?category=slug) — büyük liste bellekte toplanmadan parça parça yazılır
+@require_safe
+@condition(
+    etag_func=lambda request: _etag(*_products_state(request)),
+    last_modified_func=lambda request: _products_state(request)[1]['last_modified'],
+)
+def product_list(request):
+    _, products = _products_scope(request)
+    rows = _product_rows(products).order_by('id').iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+    def stream():
+        yield '['
+        for index, row in enumerate(rows):
+            yield (',' if index else '') + json.dumps(_serialize_product(row), cls=DjangoJSONEncoder)
+        yield ']'
+
+    return StreamingHttpResponse(stream(), content_type='application/json')
+
+
+# 2. Ürün detayı
+@require_safe
+@condition(
+    etag_func=lambda request, product_id: _etag(*_product_state(request, product_id)),
+    last_modified_func=lambda request, product_id: _product_state(request, product_id)[1]['last_modified'],
+)
+def product_detail(request, product_id):
+    row = _product_rows(Product.objects.filter(pk=product_id, is_active=True), 'description').first()
+    if row is None:
+        raise Http404
+    data = _serialize_product(row)
+    data['description'] = row['description']
+    return JsonResponse(data)
+
+
+# 3. Kategoriler
+@require_safe
+@condition(
+    etag_func=lambda request: _etag(*_categories_state(request)),
+    last_modified_func=lambda request: _categories_state(request)[1]['last_modified'],
+)
+def category_list(request):
+    categories = Category.objects.order_by('name').values('id', 'name', 'slug', 'updated_at')
+    return JsonResponse({'categories': [
+        dict(category, url=reverse('product_list_by_category', args=[category['slug']]))
+        for category in categories
+    ]})
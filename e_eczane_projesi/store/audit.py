@@ -0,0 +1,301 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import UserActivityLog
+
+# Güvenlik logları (UserActivityLog) için tamponlu yazıcı. Tüm kayıtlar log_activity() üzerinden geçer.
+# - Olaylar süreç içinde bir tamponda birikir; BATCH_SIZE olaya ulaşınca ya da FLUSH_INTERVAL_MS
+#   geçince arka plandaki iş parçacığı hepsini tek bulk_create ile yazar. İstek INSERT beklemez.
+# - Süreç kapanırken (atexit) tampon boşaltılır.
+# - SPOOL_DIR verilirse her olay tampona girmeden önce süreç başına bir dosyaya yazılıp fsync
+#   edilir. Süreç çökerse dosya kalır; yeni başlayan yazıcı (ya da recover_audit_spool komutu)
+#   sahibi yaşamayan dosyaları veritabanına aktarır. Bu durumda olaylar en az bir kez yazılır.
+#   Dosya adında pid'in yanında sürecin başlama zamanı da var: pid başka bir sürece geçmişse
+#   (yeniden başlatma, konteyner) başlama zamanı tutmaz ve dosya yine aktarılır.
+# - BATCH_SIZE 1 ise (ör. testler) tampon kullanılmaz, olay hemen yazılır.
+# - Bir transaction'ın parçası olması gereken loglar (ör. iş kuyruğundaki görevler) sync=True ile
+#   doğrudan o transaction içinde yazılır.
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL_MS': 1000,
+    'SPOOL_DIR': None,
+    # Veritabanına yazılamazken bellekte tutulacak en fazla olay (fazlası en eskiden atılır)
+    'MAX_BUFFER': 10000,
+}
+
+SPOOL_PATTERN = 'audit-{}.jsonl'
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'AUDIT_LOG', {})}
+
+
+def _event(action, description, user_id, ip_address, timestamp):
+    return {
+        'user_id': user_id,
+        'action': action,
+        'description': description,
+        'ip_address': ip_address,
+        'timestamp': (timestamp or timezone.now()).isoformat(),
+    }
+
+
+def write_events(events):
+    if not events:
+        return
+    # Bu arada silinmiş kullanıcıların logları kullanıcısız kalsın (toplu yazım düşmesin)
+    user_ids = {event['user_id'] for event in events if event['user_id']}
+    existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+    UserActivityLog.objects.bulk_create([
+        UserActivityLog(
+            user_id=event['user_id'] if event['user_id'] in existing else None,
+            action=event['action'],
+            description=event['description'],
+            ip_address=event['ip_address'],
+            timestamp=parse_datetime(event['timestamp']),
+        )
+        for event in events
+    ], batch_size=500)
+
+
+def _read_spool(path):
+    events = []
+    with open(path, encoding='utf-8') as spool:
+        for line in spool:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                pass  # Çökme anında yarım kalmış son satır
+    return events
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+# Sürecin başlama zamanı (açılıştan beri saat tıkı, /proc/<pid>/stat 22. alan). /proc yoksa None.
+def _process_start(pid):
+    try:
+        with open(f'/proc/{pid}/stat', encoding='ascii', errors='replace') as stat:
+            # Komut adı boşluk ve parantez içerebilir; alanları son ')' işaretinden sonra say
+            return stat.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def _owner_alive(pid, start):
+    if pid == os.getpid() or not _pid_alive(pid):
+        return False
+    current = _process_start(pid)
+    if start is None or current is None:
+        return True  # Karşılaştırılamıyor; yaşıyor say, dosyaya dokunma
+    return current == start
+
+
+def _owner_token():
+    return f'{os.getpid()}-{_process_start(os.getpid()) or 0}'
+
+
+# Dosyanın sahibi (pid, başlama zamanı): audit-<pid>-<başlama>-<belirteç>.jsonl[.<sıra>],
+# aktarılırken ...recovering-<pid>-<başlama>. Eski biçimde (başlama zamanı yok) başlama None.
+def _spool_owner(path):
+    name = os.path.basename(path)
+    if '.recovering-' in name:
+        parts = name.rsplit('.recovering-', 1)[1].split('-')
+    else:
+        parts = name.split('.', 1)[0].split('-')[1:]
+        parts = parts[:2] if len(parts) > 2 else parts[:1]
+    if not parts[0].isdigit():
+        return None, None
+    start = parts[1] if len(parts) > 1 and parts[1] != '0' else None
+    return int(parts[0]), start
+
+
+# Çökmüş süreçlerden kalan dosyaları veritabanına aktar. Aktarılan olay sayısını döndürür.
+# own: bu sürecin kendi dosya adı öneki (atlanır). Aynı pid'i almış eski bir sürecin dosyaları
+# farklı başlama zamanı ya da belirteç taşıdığı için aktarılır.
+def recover_spool(directory, own=None):
+    recovered = 0
+    for path in sorted(glob.glob(os.path.join(directory, SPOOL_PATTERN.format('*')) + '*')):
+        pid, start = _spool_owner(path)
+        if pid is None or (own and os.path.basename(path).startswith(own)):
+            continue
+        if _owner_alive(pid, start):
+            continue
+        # Dosyayı yeniden adlandırarak sahiplen; aynı anda başlayan iki süreç aynı dosyayı aktarmasın
+        claimed = f"{path.rsplit('.recovering-', 1)[0]}.recovering-{_owner_token()}"
+        try:
+            os.replace(path, claimed)
+        except OSError:
+            continue
+        events = _read_spool(claimed)
+        write_events(events)
+        os.remove(claimed)
+        recovered += len(events)
+    return recovered
+
+
+class Spool:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = SPOOL_PATTERN.format(f'{_owner_token()}-{uuid.uuid4().hex[:8]}')
+        self.path = os.path.join(directory, self.name)
+        self.file = None
+        self.sequence = 0
+
+    def append(self, event):
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(json.dumps(event) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    # Şu ana kadar yazılanları ayrı bir dosyaya al (veritabanına yazılınca silinecek)
+    def rotate(self):
+        if self.file is None:
+            return None
+        self.file.close()
+        self.file = None
+        self.sequence += 1
+        target = f'{self.path}.{self.sequence}'
+        os.replace(self.path, target)
+        return target
+
+
+class AuditLogWriter:
+    def __init__(self, batch_size, flush_interval_ms, spool_dir=None, max_buffer=DEFAULTS['MAX_BUFFER']):
+        self.batch_size = batch_size
+        self.interval = flush_interval_ms / 1000
+        self.max_buffer = max_buffer
+        self.spool = Spool(spool_dir) if spool_dir else None
+        self.condition = threading.Condition()
+        self.buffer = []
+        # Yazılamamış olayların dosyaları; olaylar tamponda, bir sonraki başarılı yazımda silinir
+        self.pending_files = []
+        self.thread = None
+        self.closed = False
+        self.pid = os.getpid()
+
+    def add(self, event):
+        with self.condition:
+            if self.closed:
+                write_events([event])
+                return
+            if self.spool:
+                self.spool.append(event)
+            self.buffer.append(event)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self.thread.start()
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+
+    def _run(self):
+        if self.spool:
+            try:
+                recover_spool(self.spool.directory, own=self.spool.name)
+            except Exception:
+                logger.exception("Eski güvenlik logu dosyaları aktarılamadı")
+        while True:
+            with self.condition:
+                if not self.closed and len(self.buffer) < self.batch_size:
+                    self.condition.wait(self.interval)
+                if self.closed:
+                    return
+            # Bu iş parçacığının kendi bağlantısı; kopmuş ya da süresi dolmuşsa yenilensin
+            close_old_connections()
+            self.flush()
+            close_old_connections()
+
+    def flush(self):
+        with self.condition:
+            events, self.buffer = self.buffer, []
+            if self.spool:
+                rotated = self.spool.rotate()
+                if rotated:
+                    self.pending_files.append(rotated)
+            files, self.pending_files = self.pending_files, []
+        if not events:
+            return 0
+
+        try:
+            write_events(events)
+        except Exception:
+            logger.exception("Güvenlik logları yazılamadı (%s olay), tekrar denenecek", len(events))
+            with self.condition:
+                self.buffer[:0] = events
+                del self.buffer[:-self.max_buffer]
+                self.pending_files[:0] = files
+            return 0
+
+        for path in files:
+            os.remove(path)
+        return len(events)
+
+    def close(self):
+        if os.getpid() != self.pid:
+            return  # fork ile kopyalanmış; tampon ana sürece ait
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval + 5)
+        self.flush()
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer, _writer_pid
+    # fork edilen worker'lar (gunicorn --preload) ana sürecin yazıcısını paylaşmasın
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                config = _config()
+                _writer = AuditLogWriter(
+                    config['BATCH_SIZE'], config['FLUSH_INTERVAL_MS'], config['SPOOL_DIR'], config['MAX_BUFFER'],
+                )
+                _writer_pid = os.getpid()
+                atexit.register(_writer.close)
+    return _writer
+
+
+# Tek giriş noktası: log_activity('LOGIN', "...", user=user, ip_address=ip)
+def log_activity(action, description, user=None, ip_address=None, timestamp=None, user_id=None, sync=False):
+    if user is not None:
+        user_id = user.pk
+    event = _event(action, description, user_id, ip_address, timestamp)
+    if sync or _config()['BATCH_SIZE'] <= 1:
+        write_events([event])
+    else:
+        get_writer().add(event)
+
+
+def flush():
+    if _writer is not None and _writer_pid == os.getpid():
+        return _writer.flush()
+    return 0
@@ -0,0 +1,92 @@
+import time
+
+from django.core.cache import cache
+
+# Sürüm sayaçlarıyla önbellek geçersiz kılma:
+# Önbellekteki parçaları tek tek silmek yerine anahtara bir sürüm numarası ekliyoruz.
+# Ürün/kategori değişince sayacı artırıyoruz, eski anahtarlar bir daha okunmuyor ve
+# süreleri dolunca kendiliğinden düşüyor. (Sinyaller: store/signals.py)
+# - Ürün başına sayaç (product:<id>): ürünün herhangi bir alanı, stoğu ya da yorumları değişince.
+#   Kart ve detay önbellekleri bununla anahtarlanır; sipariş/rezervasyon sadece bunları artırır.
+# - Katalog sayacı: ad, slug, kategori, fiyat ya da yayın durumu değişince (ürün eklenip silinince).
+#   Arama önerileri bununla anahtarlanır; stok değişimi bunları boşa düşürmez.
+# - Ürün verisi sayacı: herhangi bir ürün sayacı artınca o da artar (stok ve puan dahil).
+#   Katalog API'sinin liste doğrulayıcısı (ETag / Last-Modified) ve stoğa bağlı filtre adetleri
+#   (katalog sayacıyla birlikte) bununla anahtarlanır.
+
+VERSION_KEY = 'store:version:{}'
+
+PRODUCT_VERSION = 'product'
+CATALOG_VERSION = 'catalog'
+PRODUCT_DATA_VERSION = 'product_data'
+CATEGORY_VERSION = 'category'
+
+# Ürün detay sayfası önbelleği (ürün + onaylı yorumlar + puan özeti)
+PRODUCT_DETAIL_KEY = 'store:product_detail:{}:{}'
+PRODUCT_DETAIL_TIMEOUT = 60 * 60
+
+# Parça önbelleği süresi (sn). Sayaç paylaşılmayan kurulumlarda (ör. birden fazla
+# süreçte locmem) en fazla bu kadar eski veri görülebilir.
+FRAGMENT_TIMEOUT = 60 * 10
+
+
+def _initial_version():
+    # Sayaç önbellekten düşerse 1'den başlamasın; eski bir parçayla çakışmasın diye zaman damgası
+    return int(time.time() * 1000)
+
+
+def get_versions(*names):
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    found = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for name, key in keys.items():
+        if key in found:
+            versions[name] = found[key]
+        else:
+            versions[name] = missing[key] = _initial_version()
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(name):
+    key = VERSION_KEY.format(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Anahtar yoksa (ilk kullanım ya da önbellek temizlendi)
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+# Tek bir ürünün sürümü (ürün kaydı ya da yorumları değişince artar)
+def product_version_name(product_id):
+    return f'{PRODUCT_VERSION}:{product_id}'
+
+
+# Ürünün kendi sayacı + ürün verisi sayacı (katalog sayacına dokunmaz)
+def bump_product_version(product_id):
+    bump_version(product_version_name(product_id))
+    bump_version(PRODUCT_DATA_VERSION)
+
+
+# Ürün kartları için sayaçlar tek get_many ile: {ürün id: sürüm}
+def product_versions(product_ids):
+    names = {product_id: product_version_name(product_id) for product_id in product_ids}
+    versions = get_versions(*names.values())
+    return {product_id: versions[name] for product_id, name in names.items()}
+
+
+# Sinyal tetiklemeyen toplu stok güncellemelerinden (sipariş, rezervasyon) sonra. Katalog
+# sayacına dokunmuyor: bu ürünlerin kartları, detay sayfaları ve API doğrulayıcıları yenilenir.
+def bump_product_versions(product_ids):
+    for product_id in product_ids:
+        bump_version(product_version_name(product_id))
+    if product_ids:
+        bump_version(PRODUCT_DATA_VERSION)
@@ -0,0 +1,301 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, Now
+
+from .models import CART_LINE_TOTAL, Cart, CartItem, Product
+from .reservations import lock_products, reserve, sweep_expired, sync_holds
+
+# Sepet yazma işlemleri.
+# Sepete ekleme önce stoğu ayırır (store/reservations.py: koşullu UPDATE, stock - reserved >= 1),
+# ayırabildiyse satırı tek bir INSERT ... ON CONFLICT DO UPDATE ile yazar: satır yoksa 1 adetle
+# eklenir, varsa adet veritabanında artırılır. (cart, product) üzerindeki tekil kısıt sayesinde
+# çift tıklama / eşzamanlı sekmeler çift satır üretemez, oku-değiştir-yaz olmadığı için artış
+# kaybolmaz. (PostgreSQL ve SQLite >= 3.24 destekler.)
+
+UPSERT_ADD_ONE_SQL = """
+    INSERT INTO {item} (cart_id, product_id, quantity) VALUES (%s, %s, 1)
+    ON CONFLICT (cart_id, product_id) DO UPDATE
+    SET quantity = {item}.quantity + 1
+"""
+
+# Birden fazla ürünü tek ifadede ekle (giriş yapınca oturum sepetini birleştirme vb.).
+# Eklenen adet satılabilir adetle (stock - reserved) sınırlanır; sepetin kendi ayırdığı adet
+# zaten reserved içinde olduğu için mevcut satıra sadece kalan kadar eklenebilir.
+UPSERT_ADD_MANY_SQL = """
+    INSERT INTO {item} (cart_id, product_id, quantity)
+    SELECT %s, p.id, CASE WHEN v.column2 > p.stock - p.reserved THEN p.stock - p.reserved ELSE v.column2 END
+    FROM (VALUES {values}) AS v JOIN {product} p ON p.id = v.column1
+    WHERE p.stock - p.reserved > 0 AND v.column2 > 0
+    ON CONFLICT (cart_id, product_id) DO UPDATE
+    SET quantity = {item}.quantity + excluded.quantity
+"""
+
+# Adetleri verilen değere ayarla: satılabilir adet + sepetin bu üründe zaten tuttuğu adetle sınırlı
+UPSERT_SET_MANY_SQL = """
+    INSERT INTO {item} (cart_id, product_id, quantity)
+    SELECT %s, p.id, CASE
+        WHEN v.column2 > p.stock - p.reserved + COALESCE(i.quantity, 0)
+        THEN p.stock - p.reserved + COALESCE(i.quantity, 0)
+        ELSE v.column2
+    END
+    FROM (VALUES {values}) AS v JOIN {product} p ON p.id = v.column1
+    LEFT JOIN {item} i ON i.cart_id = %s AND i.product_id = p.id
+    WHERE v.column2 > 0 AND p.stock - p.reserved + COALESCE(i.quantity, 0) > 0
+    ON CONFLICT (cart_id, product_id) DO UPDATE
+    SET quantity = excluded.quantity
+"""
+
+# Ziyaretçinin (giriş yapmamış) sepeti oturumda duruyor: {"ürün_id": adet}
+SESSION_CART_KEY = 'cart'
+
+
+def _sql(template, **extra):
+    return template.format(item=CartItem._meta.db_table, product=Product._meta.db_table, **extra)
+
+
+# Oturumun sepetini getir, yoksa oluştur (cart_id tekil; yarışta ikinci istek mevcut olanı alır)
+def get_or_create_cart(cart_id, user=None):
+    try:
+        cart, _ = Cart.objects.get_or_create(cart_id=cart_id, defaults={'user': user})
+    except IntegrityError:
+        cart = Cart.objects.get(cart_id=cart_id)
+    return cart
+
+
+# Giriş yapmış kullanıcının kalıcı sepeti (eski oturumlardan kalma birden fazla sepet varsa en yenisi)
+def user_carts(user):
+    return Cart.objects.filter(user=user).order_by('-id')
+
+
+def get_user_cart(user):
+    return user_carts(user).first()
+
+
+def get_or_create_user_cart(request, user=None):
+    user = user or request.user
+    cart = get_user_cart(user)
+    if cart is None:
+        if not request.session.session_key:
+            request.session.create()
+        cart = get_or_create_cart(request.session.session_key, user)
+    return cart
+
+
+# Rozet sayacını satırlardan tek UPDATE ile yeniden hesapla (toplu işlemlerden sonra)
+def refresh_item_count(cart):
+    totals = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart').annotate(
+        total=Sum('quantity'),
+    ).values('total')
+    Cart.objects.filter(pk=cart.pk).update(
+        item_count=Coalesce(Subquery(totals), Value(0)), updated_at=Now(),
+    )
+
+
+# Sepet satırı kilidi. Sepete yazan her işlem ve ödeme önce bunu alır (sonra ürün kilitleri), böylece
+# ödeme sürerken eklenen ürün, siparişe girmeden satırı ve rezervasyonu silinmiş olmaz.
+def lock_cart(cart):
+    Cart.objects.select_for_update().filter(pk=cart.pk).values_list('pk', flat=True).first()
+
+
+# Sepet sayfası için satırlar: ürünle birlikte tek sorguda; satır tutarı, toplam adet ve genel toplam
+# veritabanında hesaplanıyor (pencere fonksiyonu ile her satırda sepetin toplamları da geliyor).
+def cart_lines(cart):
+    return (
+        CartItem.objects.filter(cart=cart)
+        .select_related('product')
+        .only('id', 'quantity', 'product__id', 'product__name', 'product__price', 'product__image')
+        .annotate(
+            line_total=CART_LINE_TOTAL,
+            cart_total=Window(Sum(CART_LINE_TOTAL)),
+            cart_quantity=Window(Sum('quantity')),
+        )
+        .order_by('id')
+    )
+
+
+# Ürünü 1 adet ekle. Eklendiyse True, satılabilir adet kalmadıysa False döner.
+def add_one(cart, product_id):
+    added = _add_one(cart, product_id)
+    if not added and sweep_expired(product_ids=[product_id]):
+        # Süresi dolmuş rezervasyonlar henüz silinmemişti; yer açıldıysa bir kez daha dene
+        added = _add_one(cart, product_id)
+    return added
+
+
+def _add_one(cart, product_id):
+    with transaction.atomic():
+        lock_cart(cart)
+        if not reserve(cart, product_id):
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(_sql(UPSERT_ADD_ONE_SQL), [cart.pk, product_id])
+        cart.adjust_item_count(1)
+    return True
+
+
+def _upsert_many(cart, template, quantities):
+    rows = [(int(product_id), int(quantity)) for product_id, quantity in quantities.items() if int(quantity) > 0]
+    if not rows:
+        return
+    values = ', '.join(['(%s, %s)'] * len(rows))
+    params = [cart.pk] + [value for row in rows for value in row]
+    # SET ifadesi sepetin mevcut satırlarına da bakıyor (ikinci sepet parametresi)
+    params += [cart.pk] * (template.count('%s') - 1)
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(template, values=values), params)
+
+
+# Birden fazla ürünü ekle: {ürün_id: adet}. Ürün kilidi + tek INSERT + sayaç + rezervasyon eşitleme.
+def add_many(cart, quantities):
+    with transaction.atomic():
+        lock_cart(cart)
+        lock_products(int(product_id) for product_id in quantities)
+        _upsert_many(cart, UPSERT_ADD_MANY_SQL, quantities)
+        refresh_item_count(cart)
+        sync_holds(cart)
+
+
+class CartOperationError(ValueError):
+    pass
+
+
+CART_OPERATIONS = ('add', 'set', 'remove')
+
+# Tek satırda olabilecek en fazla adet; daha büyük değerler veritabanı tamsayısını taşırmasın
+MAX_LINE_QUANTITY = 10 ** 4
+
+# Product.id BigAutoField: PostgreSQL bigint üst sınırı
+MAX_PRODUCT_ID = 2 ** 63 - 1
+
+
+def _whole_number(value):
+    # JSON'dan gelen 2.0, 1e20, True gibi değerler adet sayılmaz; "3" gibi metinler kabul
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise CartOperationError("Geçersiz işlem.")
+    try:
+        return int(value)
+    except ValueError:
+        raise CartOperationError("Geçersiz işlem.")
+
+
+# Toplu işlem listesini ürün başına net sonuca indir:
+# [{'op': 'add'|'set'|'remove', 'product_id': 1, 'quantity': 2}, ...]
+# -> (eklenecekler, ayarlanacaklar, silinecekler)
+def fold_operations(operations):
+    final = {}
+    for operation in operations:
+        try:
+            op = operation['op']
+            product_id = _whole_number(operation['product_id'])
+            quantity = _whole_number(operation.get('quantity', 1))
+        except (KeyError, TypeError):
+            raise CartOperationError("Geçersiz işlem.")
+        if op not in CART_OPERATIONS:
+            raise CartOperationError(f"Geçersiz işlem: {op}")
+        # 'set' 0 ile satırı siler ('remove' adede bakmaz); eklenen adet 1..MAX_LINE_QUANTITY
+        if not 1 <= product_id <= MAX_PRODUCT_ID or not (1 if op == 'add' else 0) <= quantity <= MAX_LINE_QUANTITY:
+            raise CartOperationError("Geçersiz adet.")
+
+        previous = final.get(product_id)
+        if op == 'remove' or (op == 'set' and quantity == 0):
+            final[product_id] = ('remove', 0)
+        elif op == 'set':
+            final[product_id] = ('set', quantity)
+        elif previous is None:
+            final[product_id] = ('add', quantity)
+        elif previous[0] == 'remove':
+            final[product_id] = ('set', quantity)
+        else:
+            final[product_id] = (previous[0], min(previous[1] + quantity, MAX_LINE_QUANTITY))
+
+    adds = {pid: quantity for pid, (op, quantity) in final.items() if op == 'add'}
+    sets = {pid: quantity for pid, (op, quantity) in final.items() if op == 'set'}
+    removes = [pid for pid, (op, _) in final.items() if op == 'remove']
+    return adds, sets, removes
+
+
+# Toplu sepet işlemi: tek transaction, en fazla 3 toplu ifade + sayaç + rezervasyon eşitleme
+def apply_operations(cart, operations):
+    adds, sets, removes = fold_operations(operations)
+    with transaction.atomic():
+        lock_cart(cart)
+        if removes:
+            CartItem.objects.filter(cart=cart, product_id__in=removes).delete()
+        lock_products([*sets, *adds])
+        _upsert_many(cart, UPSERT_SET_MANY_SQL, sets)
+        _upsert_many(cart, UPSERT_ADD_MANY_SQL, adds)
+        refresh_item_count(cart)
+        sync_holds(cart)
+    return dict(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity'))
+
+
+class SessionCart:
+    # Ziyaretçi sepeti. Veritabanına yazmıyor; oturum da ancak ilk eklemede oluşuyor,
+    # böylece sadece gezinen ziyaretçiler ve botlar için hiçbir kayıt açılmıyor.
+    def __init__(self, session):
+        self.session = session
+        self.items = session.get(SESSION_CART_KEY, {})
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __contains__(self, product_id):
+        return str(product_id) in self.items
+
+    @property
+    def count(self):
+        return sum(self.items.values())
+
+    def quantities(self):
+        return {int(product_id): quantity for product_id, quantity in self.items.items()}
+
+    def _save(self):
+        self.session[SESSION_CART_KEY] = self.items
+        self.session.modified = True
+
+    # Stok sınırına takıldıysa False
+    def add(self, product, quantity=1):
+        key = str(product.pk)
+        current = self.items.get(key, 0)
+        if current >= product.available:
+            return False
+        self.items[key] = min(current + quantity, product.available)
+        self._save()
+        return True
+
+    def remove(self, product_id):
+        quantity = self.items.pop(str(product_id), None)
+        if quantity is not None:
+            self._save()
+        return quantity
+
+    def clear(self):
+        self.items = {}
+        self.session.pop(SESSION_CART_KEY, None)
+
+    # Toplu işlem (bkz. apply_operations); stok sınırı için ürünler tek sorguda okunur
+    def apply_operations(self, operations):
+        adds, sets, removes = fold_operations(operations)
+        for product_id in removes:
+            self.items.pop(str(product_id), None)
+        stocks = dict(
+            Product.objects.filter(pk__in=[*adds, *sets], is_active=True)
+            .values_list('id', F('stock') - F('reserved'))
+        )
+        for product_id, quantity in sets.items():
+            self.items[str(product_id)] = min(quantity, stocks.get(product_id, 0))
+        for product_id, quantity in adds.items():
+            current = self.items.get(str(product_id), 0)
+            self.items[str(product_id)] = min(current + quantity, stocks.get(product_id, 0))
+        self.items = {key: quantity for key, quantity in self.items.items() if quantity > 0}
+        self._save()
+        return self.quantities()
+
+
+# Giriş yapınca: oturumdaki sepeti kullanıcının kalıcı sepetine tek seferde aktar
+def merge_session_cart(request, user):
+    session_cart = SessionCart(request.session)
+    if not session_cart:
+        return
+    add_many(get_or_create_user_cart(request, user), session_cart.quantities())
+    session_cart.clear()
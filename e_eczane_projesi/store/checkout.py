@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest, Now
+
+from .cache import bump_product_versions
+from .cart import cart_lines, lock_cart
+from .models import Cart, CartItem, Order, OrderItem, Product, StockReservation, order_summary
+from .purchases import record_purchases
+from .reservations import recount_reserved
+from .tasks import schedule_order_followups
+
+# Sipariş oluşturma. Hepsi tek transaction içinde ve satır sayısından bağımsız sabit sorgu sayısıyla:
+# 1. Sepet satırı kilitlenir (aynı sepetle iki eşzamanlı ödeme sırayla çalışır).
+# 2. Ürün satırları id sırasıyla kilitlenir; iki alıcı aynı ürünleri farklı sırada sepete
+#    koymuş olsa da kilit sırası aynı olduğu için deadlock oluşmaz.
+# 3. Stok tek koşullu UPDATE ile düşer: SET stock = stock - q WHERE stock - (başkalarının ayırdığı) >= q.
+#    Sepetin kendi rezervasyonu (store/reservations.py) reserved'dan aynı ifadede düşülür.
+#    Güncellenen satır sayısı sepet satırı sayısından azsa biri yetmemiştir -> her şey geri alınır.
+# 4. Sipariş satırları ve (kullanıcı, ürün) satın alma kayıtları bulk_create ile yazılır, sepet boşaltılır.
+# 5. Sonraki işler (log, e-posta) kuyruğa aynı transaction'da yazılır; işçi onları commit'ten sonra görür.
+# Önbellek sürümleri ancak commit olunca artırılır.
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class EmptyCart(CheckoutError):
+    pass
+
+
+class OutOfStock(CheckoutError):
+    def __init__(self, products):
+        self.products = products
+        super().__init__(', '.join(products))
+
+
+def _per_product(quantities, default=None):
+    # {ürün_id: değer} -> CASE id WHEN ... THEN değer ELSE default END
+    return Case(
+        *[When(pk=product_id, then=Value(value)) for product_id, value in quantities.items()],
+        default=Value(default),
+        output_field=IntegerField(),
+    )
+
+
+def place_order(user, cart, ip_address=None):
+    with transaction.atomic():
+        # 1. Sepet kilidi
+        lock_cart(cart)
+        lines = list(cart_lines(cart))
+        if not lines:
+            raise EmptyCart()
+
+        quantities = {line.product_id: line.quantity for line in lines}
+        product_ids = sorted(quantities)
+
+        # 2. Ürün kilitleri (id sırasıyla); kilit altında okunan stok kesin
+        locked = Product.objects.select_for_update().filter(pk__in=product_ids).order_by('id')
+        rows = list(locked.values_list('id', 'name', 'stock', 'reserved', 'is_active'))
+        # Sepetin rezervasyonları kilitten sonra okunur: arada temizlenen/eklenen rezervasyon
+        # reserved'dan düşülecek adetle (own) uyuşmazlık yaratmasın
+        holds = list(StockReservation.objects.filter(cart=cart).values_list('id', 'product_id', 'quantity'))
+        held = {product_id: quantity for _, product_id, quantity in holds}
+        short = [
+            name for product_id, name, stock, reserved, is_active in rows
+            if not is_active or stock - reserved + held.get(product_id, 0) < quantities[product_id]
+        ]
+        if short:
+            raise OutOfStock(short)
+
+        # 3. Koşullu stok düşme (satır kilidi olmayan veritabanlarında da fazla satışı engeller)
+        needed = _per_product(quantities)
+        own = _per_product(held, default=0)
+        updated = Product.objects.filter(
+            pk__in=product_ids, is_active=True, stock__gte=F('reserved') - own + needed,
+        ).update(
+            stock=F('stock') - needed, reserved=Greatest(F('reserved') - own, Value(0)), updated_at=Now(),
+        )
+        if updated != len(product_ids):
+            raise OutOfStock([line.product.name for line in lines])
+
+        # 4. Sipariş ve satırları
+        order = Order.objects.create(
+            user=user,
+            total_price=lines[0].cart_total,
+            item_count=lines[0].cart_quantity,
+            summary=order_summary((line.product.name, line.quantity) for line in lines),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=line.product_id, quantity=line.quantity, price=line.product.price)
+            for line in lines
+        ])
+        # Yorum yetkisi için (kullanıcı, ürün) kaydı; daha önce alınmışsa atlanır
+        record_purchases(user.pk, product_ids)
+        # Sadece siparişe giren satırlar ve reserved'dan düşülen rezervasyonlar silinir
+        CartItem.objects.filter(pk__in=[line.pk for line in lines]).delete()
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+        stray = set(held) - set(product_ids)
+        if stray:
+            # Satırı kalmamış eski rezervasyonlar: sayaçlarını satırlardan düzelt
+            recount_reserved(stray)
+        Cart.objects.filter(pk=cart.pk).update(item_count=0, updated_at=Now())
+
+        # 5. Sonraki işler
+        schedule_order_followups(order, ip_address)
+
+        transaction.on_commit(lambda: bump_product_versions(product_ids))
+    return order
@@ -1,12 +1,14 @@
-from .models import Cart
+from django.utils.functional import SimpleLazyObject
+from .cart import SessionCart, user_carts
 
+# Sepet rozeti: sayı Cart.item_count'ta hazır tutuluyor (her sepet işlemi günceller).
+# Tembel değer: şablon {{ cart_item_count }} yazdırmazsa (admin sayfaları vb.) sorgu hiç atılmaz.
 def cart_count(request):
-    count = 0
-    if request.user.is_authenticated:
+    def count():
+        if not request.user.is_authenticated:
+            # Ziyaretçi sepeti oturumda, veritabanına gitmeye gerek yok
+            return SessionCart(request.session).count
         # Kullanıcının sepetini bul, yoksa hata verme
-        cart = Cart.objects.filter(user=request.user).first()
-        if cart:
-            # Sepetteki tüm ürünlerin adetlerini topla (Örn: 2 Aspirin + 1 Vitamin = 3)
-            count = sum(item.quantity for item in cart.items.all())
-    
-    return {'cart_item_count': count}
\ No newline at end of file
+        return user_carts(request.user).values_list('item_count', flat=True).first() or 0
+
+    return {'cart_item_count': SimpleLazyObject(count)}
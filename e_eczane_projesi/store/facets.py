@@ -0,0 +1,112 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+
+from .cache import CATALOG_VERSION, PRODUCT_DATA_VERSION, get_versions
+from .search import search_terms
+
+# Ürün listesi filtreleri (fiyat aralığı, sadece stoktakiler, kategori) ve yanlarındaki adetler.
+# Her değer için ayrı COUNT atmak yerine tüm adetleri kategoriye göre gruplanmış TEK bir
+# koşullu aggregate sorgusuyla hesaplıyoruz. Her filtrenin adedi, diğer seçili filtreler
+# uygulanmış halde sayılır (kendi filtresi hariç), böylece kullanıcı seçimini değiştirince
+# kaç ürün göreceğini bilir.
+
+# (anahtar, etiket, alt sınır, üst sınır) — alt dahil, üst hariç
+PRICE_BANDS = (
+    ('0-50', '50 ₺ altı', None, 50),
+    ('50-100', '50 - 100 ₺', 50, 100),
+    ('100-250', '100 - 250 ₺', 100, 250),
+    ('250-', '250 ₺ ve üstü', 250, None),
+)
+
+FACET_KEY = 'store:facets:{}:{}:{}'
+FACET_TIMEOUT = 60 * 5
+
+
+def price_band_condition(band):
+    for key, _, low, high in PRICE_BANDS:
+        if key == band:
+            condition = Q()
+            if low is not None:
+                condition &= Q(price__gte=low)
+            if high is not None:
+                condition &= Q(price__lt=high)
+            return condition
+    return Q()
+
+
+# Satılabilir adedi olan (stok - sepetlerde ayrılmış > 0) ürünler
+IN_STOCK = Q(stock__gt=F('reserved'))
+
+
+class FacetFilters:
+    def __init__(self, price=None, in_stock=False):
+        self.price = price if price in {band[0] for band in PRICE_BANDS} else None
+        self.in_stock = in_stock
+
+    @classmethod
+    def from_request(cls, request):
+        return cls(price=request.GET.get('price'), in_stock=request.GET.get('stock') == '1')
+
+    @property
+    def price_condition(self):
+        return price_band_condition(self.price) if self.price else Q()
+
+    @property
+    def stock_condition(self):
+        return IN_STOCK if self.in_stock else Q()
+
+    def apply(self, queryset):
+        return queryset.filter(self.price_condition & self.stock_condition)
+
+
+def _count(condition):
+    return Count('id', filter=condition) if condition else Count('id')
+
+
+def facet_counts(base_queryset, filters, category=None, search_query=None):
+    # Önbellek anahtarı: normalize edilmiş filtreler + katalog ve ürün verisi sürümleri. "Stoktakiler"
+    # adedi sipariş/rezervasyonla değiştiği için stok değişimi de (ürün verisi sayacı) adetleri yeniler.
+    raw_key = '|'.join([
+        str(category.pk if category else ''),
+        filters.price or '',
+        '1' if filters.in_stock else '',
+        ' '.join(search_terms(search_query or '')),
+    ])
+    versions = get_versions(CATALOG_VERSION, PRODUCT_DATA_VERSION)
+    key = FACET_KEY.format(
+        versions[CATALOG_VERSION], versions[PRODUCT_DATA_VERSION], hashlib.md5(raw_key.encode()).hexdigest(),
+    )
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+
+    price = filters.price_condition
+    stock = filters.stock_condition
+    aggregates = {
+        'total': _count(price & stock),
+        'in_stock': _count(IN_STOCK & price),
+    }
+    for index, band in enumerate(PRICE_BANDS):
+        aggregates[f'band_{index}'] = _count(price_band_condition(band[0]) & stock)
+
+    rows = base_queryset.order_by().values('category_id').annotate(**aggregates)
+
+    counts = {
+        'categories': {},
+        'bands': [[key, label, 0] for key, label, _, _ in PRICE_BANDS],
+        'in_stock': 0,
+        'total': 0,
+    }
+    for row in rows:
+        counts['categories'][row['category_id']] = row['total']
+        if category is not None and row['category_id'] != category.pk:
+            continue
+        counts['total'] += row['total']
+        counts['in_stock'] += row['in_stock']
+        for index in range(len(PRICE_BANDS)):
+            counts['bands'][index][2] += row[f'band_{index}']
+
+    cache.set(key, counts, FACET_TIMEOUT)
+    return counts
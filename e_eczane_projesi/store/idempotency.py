@@ -0,0 +1,135 @@
+import random
+import re
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+# İdempotency anahtarları: sepete ekleme, ödeme gibi yazan istekler bir anahtar taşır
+# (?key=..., form alanı 'key' ya da Idempotency-Key başlığı). Aynı kullanıcı + aynı işlem +
+# aynı anahtarla gelen ikinci istek işi tekrar yapmaz; ilk isteğin saklanan yanıtı tek bir
+# indeksli sorguyla döner. Anahtarı tarayıcıda base.html'deki betik üretiyor
+# (data-idempotent işaretli link/formlara, sayfa başına bir kez).
+# Tarayıcı ön yüklemeleri (prefetch/prerender) hiç çalıştırılmaz.
+
+KEY_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+KEY_TTL = timedelta(hours=24)
+
+# Saklanacak en büyük yanıt gövdesi (JSON uç noktaları); daha büyükse sadece durum kodu
+MAX_BODY = 64 * 1024
+
+# Süresi dolanları temizleme: isteklerin ~%1'i küçük bir parça siler, geri kalanı purge komutu
+CLEANUP_CHANCE = 0.01
+CLEANUP_BATCH = 500
+
+
+def _request_key(request):
+    key = request.headers.get('Idempotency-Key') or request.GET.get('key') or request.POST.get('key')
+    return key if key and KEY_RE.match(key) else None
+
+
+def _owner(request):
+    if request.user.is_authenticated:
+        return f'u:{request.user.pk}'
+    if not request.session.session_key:
+        request.session.create()
+    return f's:{request.session.session_key}'
+
+
+def _is_prefetch(request):
+    purpose = request.headers.get('Sec-Purpose') or request.headers.get('Purpose') or ''
+    return 'prefetch' in purpose or 'prerender' in purpose
+
+
+def _replay(record):
+    if record.status_code is None:
+        # İlk istek hâlâ çalışıyor
+        return HttpResponse("Bu istek zaten işleniyor.", status=409)
+    response = HttpResponse(record.body, status=record.status_code, content_type=record.content_type or None)
+    if record.location:
+        response['Location'] = record.location
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(owner, scope, key):
+    # Anahtarı "işleniyor" olarak kaydet; aynı anahtar zaten varsa kaydı döndür
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(owner=owner, scope=scope, key=key, expires_at=now + KEY_TTL)
+        return None
+    except IntegrityError:
+        pass
+    # Süresi dolmuş eski kayıt varsa yeniden kullan
+    reused = IdempotencyKey.objects.filter(owner=owner, scope=scope, key=key, expires_at__lte=now).update(
+        status_code=None, content_type='', location='', body='', expires_at=now + KEY_TTL,
+    )
+    if reused:
+        return None
+    return IdempotencyKey.objects.filter(owner=owner, scope=scope, key=key).first()
+
+
+def _store(owner, scope, key, response):
+    body = ''
+    if not response.streaming and len(response.content) <= MAX_BODY:
+        body = response.content.decode(response.charset or 'utf-8', errors='replace')
+    IdempotencyKey.objects.filter(owner=owner, scope=scope, key=key).update(
+        status_code=response.status_code,
+        content_type=response.get('Content-Type', ''),
+        location=response.get('Location', '')[:500],
+        body=body,
+    )
+
+
+def purge_expired(batch_size=CLEANUP_BATCH):
+    ids = list(IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    return IdempotencyKey.objects.filter(id__in=ids).delete()[0]
+
+
+# Kullanım: @idempotent('checkout'). Anahtarsız istekler eskisi gibi çalışır.
+def idempotent(scope):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if _is_prefetch(request):
+                return HttpResponse(status=204)
+            key = _request_key(request)
+            if key is None:
+                return view(request, *args, **kwargs)
+
+            owner = _owner(request)
+            full_scope = ':'.join([scope, *(str(value) for value in kwargs.values())])
+
+            # Tekrar: tek indeksli sorgu (owner, scope, key)
+            record = IdempotencyKey.objects.filter(
+                owner=owner, scope=full_scope, key=key, expires_at__gt=timezone.now(),
+            ).first()
+            if record is None:
+                record = _claim(owner, full_scope, key)
+            if record is not None:
+                return _replay(record)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                # İş yapılmadı; aynı anahtarla tekrar denenebilsin
+                IdempotencyKey.objects.filter(owner=owner, scope=full_scope, key=key).delete()
+                raise
+            if response.status_code >= 500:
+                IdempotencyKey.objects.filter(owner=owner, scope=full_scope, key=key).delete()
+            else:
+                _store(owner, full_scope, key, response)
+
+            if random.random() < CLEANUP_CHANCE:
+                purge_expired()
+            return response
+        return wrapper
+    return decorator
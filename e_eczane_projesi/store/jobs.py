@@ -0,0 +1,130 @@
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+# Harici bir kuyruk sunucusu (Redis/RabbitMQ) olmadan, veritabanındaki Job tablosu üzerinde
+# çalışan basit ve kalıcı iş kuyruğu. İşçi: `python manage.py run_jobs`.
+# - enqueue() bir transaction içinde çağrılırsa iş satırı o transaction ile birlikte commit olur;
+#   işçi işi ancak commit'ten sonra görür (sipariş geri alınırsa iş de hiç oluşmaz).
+# - Her iş kendi transaction'ında çalışır ve "tamamlandı" işareti aynı transaction'da yazılır;
+#   sadece veritabanına yazan görevler bu sayede tam bir kez etkili olur. Dışarıya etkisi olan
+#   görevler (e-posta vb.) tekrar çalışabileceği varsayımıyla yazılmalı.
+# - Hata alan iş üstel bekleme (backoff) ile tekrar denenir, max_attempts sonunda 'failed' olur.
+# - İşçi çökerse 'running' kalan işler LEASE süresi dolunca tekrar alınır.
+#   Süresi dolmuş işi bitiren eski işçi "tamamlandı" yazamaz; yaptıkları geri alınır.
+
+logger = logging.getLogger(__name__)
+
+# Görev adı -> (fonksiyon, varsayılan deneme sayısı)
+registry = {}
+
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 60 * 60
+LEASE = timedelta(minutes=10)
+
+
+class UnknownTask(Exception):
+    pass
+
+
+# İş sürerken LEASE doldu ve başka bir işçi işi aldı; bu işçinin yaptıkları geri alınır
+class LeaseLost(Exception):
+    pass
+
+
+# Görev kaydı: @task('order.activity_log')
+def task(name, max_attempts=5):
+    def register(func):
+        registry[name] = (func, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, dedupe_key=None, delay=None):
+    if name not in registry:
+        raise UnknownTask(name)
+    job = Job(
+        name=name,
+        payload=payload or {},
+        dedupe_key=dedupe_key,
+        max_attempts=registry[name][1],
+        run_at=timezone.now() + (delay or timedelta()),
+    )
+    if dedupe_key is None:
+        job.save()
+        return job
+    # Aynı anahtarla zaten kuyruktaysa yenisini eklemiyoruz
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(dedupe_key=dedupe_key)
+    return job
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    # Aynı anda düşen işler aynı anda tekrar denenmesin
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+# Sırası gelmiş işleri bu işçi adına işaretle. Kilit alanı (locked_by) sayesinde iki işçi aynı
+# işi alamaz; PostgreSQL'de SKIP LOCKED ile birbirlerini beklemeden farklı satırlara geçerler.
+def claim(batch_size=10):
+    now = timezone.now()
+    due = Q(status=Job.PENDING, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=now - LEASE)
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True).filter(due)
+            .order_by('run_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        Job.objects.filter(due, pk__in=ids).update(status=Job.RUNNING, locked_by=token, locked_at=now)
+    return list(Job.objects.filter(locked_by=token, status=Job.RUNNING).order_by('run_at'))
+
+
+def run_job(job):
+    func = registry.get(job.name, (None, None))[0]
+    attempts = job.attempts + 1
+    try:
+        if func is None:
+            raise UnknownTask(job.name)
+        with transaction.atomic():
+            func(**job.payload)
+            done = Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+                status=Job.DONE, attempts=attempts, finished_at=timezone.now(), last_error='',
+            )
+            if not done:
+                raise LeaseLost(job.pk)
+        return True
+    except LeaseLost:
+        logger.warning("İş kilidi kaybedildi, sonuç geri alındı: %s #%s", job.name, job.pk)
+        return False
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("İş başarısız: %s #%s (deneme %s)", job.name, job.pk, attempts)
+        if attempts >= job.max_attempts:
+            changes = {'status': Job.FAILED, 'finished_at': timezone.now()}
+        else:
+            changes = {'status': Job.PENDING, 'run_at': timezone.now() + backoff(attempts)}
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            attempts=attempts, last_error=error[-4000:], locked_by='', locked_at=None, **changes,
+        )
+        return False
+
+
+def run_pending(batch_size=10):
+    jobs = claim(batch_size)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
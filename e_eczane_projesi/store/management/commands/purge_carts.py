@@ -0,0 +1,131 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Min, Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from store.models import Cart, CartItem
+from store.reservations import release_holds
+
+# Boşta kalan sepetleri, satırlarını ve arkalarındaki oturumları temizler (cron / zamanlayıcı ile).
+# Tabloyu uzun süre kilitlememek için birincil anahtar aralıkları halinde ilerliyor:
+# her parça kendi kısa transaction'ında siliniyor, parçalar arasında isteğe bağlı bekleniyor.
+# Oturumların "son yazılma" zamanı expire_date - SESSION_COOKIE_AGE olarak hesaplanıyor.
+
+
+def _row_bytes(queryset):
+    # Satır boyutunu sadece PostgreSQL ölçebiliyor; diğerlerinde 0
+    if connection.vendor != 'postgresql':
+        return 0
+    table = queryset.model._meta.db_table
+    return queryset.aggregate(size=Sum(RawSQL(f'pg_column_size("{table}".*)', [])))['size'] or 0
+
+
+def _session_bytes(queryset):
+    return queryset.aggregate(size=Sum(Length('session_key') + Length('session_data')))['size'] or 0
+
+
+class Command(BaseCommand):
+    help = "Belirli bir süredir dokunulmamış sepetleri, satırlarını ve oturumlarını parça parça siler."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Bu kadar gündür güncellenmemiş sepetler (varsayılan 30)")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Bir transaction'da taranan id aralığı")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Parçalar arasında beklenecek saniye")
+        parser.add_argument('--include-users', action='store_true', help="Üyelerin boşta kalan sepetlerini de sil")
+        parser.add_argument('--dry-run', action='store_true', help="Silmeden sadece say")
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.chunk_size = options['chunk_size']
+        self.pause = options['sleep']
+        self.totals = {'carts': 0, 'items': 0, 'sessions': 0, 'bytes': 0}
+
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Oturum en son cutoff'tan önce yazıldıysa expire_date bu değerden küçüktür
+        self.session_cutoff = cutoff + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        self.now = timezone.now()
+
+        carts = Cart.objects.filter(updated_at__lt=cutoff)
+        if not options['include_users']:
+            carts = carts.filter(user__isnull=True)
+        self.purge_carts(carts)
+        self.purge_expired_sessions()
+
+        totals = self.totals
+        verb = "silinecek" if self.dry_run else "silindi"
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['carts']} sepet, {totals['items']} sepet satırı, {totals['sessions']} oturum {verb} "
+            f"(~{totals['bytes'] / 1024:.1f} KB)."
+        ))
+
+    def _chunk_done(self):
+        if self.pause:
+            time.sleep(self.pause)
+
+    # 1. Sepetler: [min_id, max_id] aralığını chunk_size'lık dilimlerle tara
+    def purge_carts(self, carts):
+        bounds = carts.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return
+
+        start = bounds['low']
+        while start <= bounds['high']:
+            end = start + self.chunk_size
+            with transaction.atomic():
+                chunk = carts.filter(id__gte=start, id__lt=end)
+                rows = list(chunk.select_for_update(skip_locked=True).values_list('id', 'cart_id'))
+                if rows:
+                    self.purge_cart_rows(rows)
+            start = end
+            self._chunk_done()
+
+    def purge_cart_rows(self, rows):
+        cart_ids = [pk for pk, _ in rows]
+        session_keys = [key for _, key in rows if key]
+
+        carts = Cart.objects.filter(id__in=cart_ids)
+        items = CartItem.objects.filter(cart_id__in=cart_ids)
+        # Oturum hâlâ kullanılıyorsa (yakın zamanda yazıldıysa) dokunmuyoruz; süresi dolmuş olanlar
+        # zaten 2. adımda gidiyor, burada sayılmıyor
+        sessions = Session.objects.filter(
+            session_key__in=session_keys, expire_date__lt=self.session_cutoff, expire_date__gte=self.now,
+        )
+
+        self.totals['bytes'] += _row_bytes(carts) + _row_bytes(items) + _session_bytes(sessions)
+        if self.dry_run:
+            self.totals['carts'] += len(cart_ids)
+            self.totals['items'] += items.count()
+            self.totals['sessions'] += sessions.count()
+            return
+
+        # Hâlâ duran rezervasyonlar kaskadla silinmeden önce ürün sayaçlarından düşülsün
+        release_holds(cart_ids)
+        self.totals['items'] += items.delete()[0]
+        self.totals['sessions'] += sessions.delete()[0]
+        self.totals['carts'] += carts.delete()[0]
+
+    # 2. Süresi dolmuş oturumlar (clearsessions'ın parça parça hali). Anahtar metin olduğu için
+    # aralık yerine "son silinen anahtardan sonraki N tanesi" şeklinde ilerliyoruz.
+    def purge_expired_sessions(self):
+        expired = Session.objects.filter(expire_date__lt=self.now).order_by('session_key')
+        last_key = ''
+        while True:
+            with transaction.atomic():
+                keys = list(expired.filter(session_key__gt=last_key).values_list('session_key', flat=True)[:self.chunk_size])
+                if not keys:
+                    break
+                sessions = Session.objects.filter(session_key__in=keys)
+                self.totals['bytes'] += _session_bytes(sessions)
+                if self.dry_run:
+                    self.totals['sessions'] += len(keys)
+                else:
+                    self.totals['sessions'] += sessions.delete()[0]
+            last_key = keys[-1]
+            self._chunk_done()
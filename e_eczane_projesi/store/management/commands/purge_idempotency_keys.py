@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.idempotency import CLEANUP_BATCH, purge_expired
+
+
+class Command(BaseCommand):
+    help = "Süresi dolmuş idempotency anahtarlarını küçük parçalar halinde siler."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=CLEANUP_BATCH, help="Bir seferde silinecek anahtar sayısı")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Parçalar arasında beklenecek saniye")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            deleted = purge_expired(options['batch_size'])
+            total += deleted
+            if deleted < options['batch_size']:
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"{total} anahtar silindi."))
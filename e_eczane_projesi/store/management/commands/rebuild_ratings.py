@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+from store.ratings import rebuild_product_ratings
+
+
+class Command(BaseCommand):
+    help = "Ürünlerin puan toplamı/adedi/ortalamasını yorum tablosundan baştan hesaplar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', help="Sadece bu ürün id'leri (tekrarlanabilir)")
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['product']:
+            products = products.filter(pk__in=options['product'])
+        updated = rebuild_product_ratings(products)
+        self.stdout.write(self.style.SUCCESS(f"{updated} ürünün puanları yeniden hesaplandı."))
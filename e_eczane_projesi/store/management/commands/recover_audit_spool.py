@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.audit import recover_spool
+
+
+class Command(BaseCommand):
+    help = "Çöken süreçlerden kalan güvenlik logu dosyalarını (AUDIT_LOG['SPOOL_DIR']) veritabanına aktarır."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Dosya klasörü (varsayılan: AUDIT_LOG['SPOOL_DIR'])")
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or getattr(settings, 'AUDIT_LOG', {}).get('SPOOL_DIR')
+        if not directory:
+            raise CommandError("AUDIT_LOG['SPOOL_DIR'] ayarlı değil; --dir ile bir klasör verin.")
+        recovered = recover_spool(str(directory))
+        self.stdout.write(self.style.SUCCESS(f"{recovered} log kaydı aktarıldı."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.popularity import materialize_all, rebuild
+
+
+class Command(BaseCommand):
+    help = "\"Çok Satanlar\" ve \"Şu An Popüler\" listelerini önbelleğe yeniden yazar (birkaç dakikada bir çalıştırılabilir)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Puanları önce sipariş geçmişinden baştan hesapla")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            products = rebuild()
+            self.stdout.write(self.style.SUCCESS(f"{products} ürünün popülerlik puanı yeniden hesaplandı."))
+        lists = materialize_all()
+        self.stdout.write(self.style.SUCCESS(f"{lists} liste (genel + kategoriler) önbelleğe yazıldı."))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from store.pairs import rebuild, refresh
+from store.rollups import SAFETY_LAG
+
+
+class Command(BaseCommand):
+    help = "\"Birlikte sıkça alınanlar\" tablosunu yeni siparişlerle günceller (--full ile baştan hesaplar)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Tüm siparişlerden baştan say (yaklaşık sayıları düzeltir)")
+        parser.add_argument('--lag-minutes', type=int, default=int(SAFETY_LAG.total_seconds() // 60),
+                            help="Bu kadar dakikadan yeni siparişler bir sonraki çalışmaya bırakılır")
+
+    def handle(self, *args, **options):
+        lag = timedelta(minutes=options['lag_minutes'])
+        products = rebuild(lag=lag) if options['full'] else refresh(lag=lag)
+        self.stdout.write(self.style.SUCCESS(f"{products} ürünün birlikte alınanlar listesi güncellendi."))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from store.rollups import SAFETY_LAG, refresh
+
+
+class Command(BaseCommand):
+    help = "Günlük satış özetlerini son çalışmadan bu yana gelen siparişlerle günceller (cron ile sık çalıştırılabilir)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Tüm siparişlerden baştan hesapla")
+        parser.add_argument('--lag-minutes', type=int, default=int(SAFETY_LAG.total_seconds() // 60),
+                            help="Bu kadar dakikadan yeni siparişler bir sonraki çalışmaya bırakılır")
+
+    def handle(self, *args, **options):
+        days = refresh(full=options['full'], lag=timedelta(minutes=options['lag_minutes']))
+        self.stdout.write(self.style.SUCCESS(f"{days} günün satış özeti yenilendi."))
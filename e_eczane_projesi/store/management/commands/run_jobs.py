@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = "Arka plan iş kuyruğunu (store.Job) çalıştırır. Sürekli çalışır; --once ile bir tur dönüp çıkar."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Sırası gelmiş işleri bitirip çık")
+        parser.add_argument('--batch-size', type=int, default=10, help="Bir seferde alınacak iş sayısı")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Kuyruk boşken bekleme süresi (sn)")
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                count = run_pending(options['batch_size'])
+                total += count
+                if count:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"{total} iş çalıştırıldı."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+from store.reservations import SWEEP_BATCH_SIZE, recount_reserved, sweep_expired
+
+
+class Command(BaseCommand):
+    help = "Süresi dolmuş stok rezervasyonlarını siler ve ürünlerin ayrılmış adet sayacını düşer (her dakika çalıştırılabilir)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help="Bir transaction'da silinecek rezervasyon sayısı")
+        parser.add_argument('--recount', action='store_true', help="Tüm ürünlerin sayacını rezervasyonlardan baştan hesapla")
+
+    def handle(self, *args, **options):
+        swept = sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{swept} rezervasyonun süresi dolmuştu, silindi."))
+
+        if options['recount']:
+            product_ids = list(Product.objects.values_list('id', flat=True))
+            recount_reserved(product_ids)
+            self.stdout.write(self.style.SUCCESS(f"{len(product_ids)} ürünün ayrılmış adedi yeniden hesaplandı."))
@@ -0,0 +1,109 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:47
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+# store.search.normalize'un bu migration anındaki kopyası (uygulama kodu değişse de migration
+# aynı sonucu üretsin)
+TURKISH_FOLD = str.maketrans({
+    'İ': 'i', 'I': 'i', 'ı': 'i',
+    'Ş': 's', 'ş': 's',
+    'Ğ': 'g', 'ğ': 'g',
+    'Ü': 'u', 'ü': 'u',
+    'Ö': 'o', 'ö': 'o',
+    'Ç': 'c', 'ç': 'c',
+    'Â': 'a', 'â': 'a',
+    'Î': 'i', 'î': 'i',
+    'Û': 'u', 'û': 'u',
+})
+
+
+def normalize(text):
+    if not text:
+        return ''
+    return ' '.join(text.translate(TURKISH_FOLD).lower().split())
+
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION store_product_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.search_name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.search_text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER store_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF search_name, search_text ON store_product
+    FOR EACH ROW EXECUTE FUNCTION store_product_search_vector_update()
+    """,
+]
+
+POSTGRES_INDEXES = [
+    "CREATE INDEX store_product_search_vector_gin ON store_product USING gin (search_vector)",
+    "CREATE INDEX store_product_search_name_trgm ON store_product USING gin (search_name gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS store_product_search_name_trgm",
+    "DROP INDEX IF EXISTS store_product_search_vector_gin",
+    "DROP TRIGGER IF EXISTS store_product_search_vector_trigger ON store_product",
+    "DROP FUNCTION IF EXISTS store_product_search_vector_update()",
+]
+
+
+def fill_search_columns(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+
+    # Mevcut ürünlerin arama sütunlarını doldur (PostgreSQL'de tetikleyici vektörü de üretir)
+    Product = apps.get_model('store', 'Product')
+    products = list(Product.objects.only('id', 'name', 'description'))
+    for product in products:
+        product.search_name = normalize(product.name)
+        product.search_text = normalize(product.description)
+    Product.objects.bulk_update(products, ['search_name', 'search_text'], batch_size=500)
+
+    # İndeksleri veri dolduktan sonra kurmak daha hızlı
+    if connection.vendor == 'postgresql':
+        for sql in POSTGRES_INDEXES:
+            schema_editor.execute(sql)
+
+
+def drop_search_objects(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_BACKWARD:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_alter_cart_cart_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_columns, drop_search_objects),
+    ]
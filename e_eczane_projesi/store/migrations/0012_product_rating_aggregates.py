@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:49
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+# store.ratings.rebuild_product_ratings'in bu migration anındaki kopyası
+def fill_ratings(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Review = apps.get_model('store', 'Review')
+
+    approved = Review.objects.filter(product=OuterRef('pk'), status=True).order_by().values('product')
+    Product.objects.update(
+        rating_sum=Coalesce(
+            Subquery(approved.annotate(total=Sum('rating')).values('total')), Value(0.0), output_field=FloatField(),
+        ),
+        rating_count=Coalesce(Subquery(approved.annotate(total=Count('id')).values('total')), Value(0)),
+        rating_avg=Coalesce(
+            Subquery(approved.annotate(average=Avg('rating')).values('average')), Value(0.0), output_field=FloatField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:54
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_item_count(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    totals = (
+        CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        .annotate(total=Sum('quantity')).values('total')
+    )
+    Cart.objects.update(item_count=Coalesce(Subquery(totals), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ürün Adedi'),
+        ),
+        migrations.RunPython(fill_item_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:55
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+# Kısıtlar eklenmeden önce eski çift kayıtları birleştir
+def merge_duplicates(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    touched = set()
+
+    # 1. Aynı cart_id'ye sahip sepetler: en eskisinde topla
+    duplicate_ids = (
+        Cart.objects.exclude(cart_id='').values('cart_id')
+        .annotate(n=Count('id'), keep=Min('id')).filter(n__gt=1)
+    )
+    for row in duplicate_ids:
+        others = Cart.objects.filter(cart_id=row['cart_id']).exclude(pk=row['keep'])
+        CartItem.objects.filter(cart__in=others).update(cart_id=row['keep'])
+        others.delete()
+        touched.add(row['keep'])
+
+    # 2. Aynı sepette aynı ürün birden fazla satırdaysa adetleri tek satırda topla
+    duplicate_items = (
+        CartItem.objects.values('cart_id', 'product_id')
+        .annotate(n=Count('id'), keep=Min('id'), total=Sum('quantity')).filter(n__gt=1)
+    )
+    for row in duplicate_items:
+        items = CartItem.objects.filter(cart_id=row['cart_id'], product_id=row['product_id'])
+        items.exclude(pk=row['keep']).delete()
+        items.update(quantity=row['total'])
+        touched.add(row['cart_id'])
+
+    for cart in Cart.objects.filter(pk__in=touched):
+        cart.item_count = CartItem.objects.filter(cart=cart).aggregate(total=Sum('quantity'))['total'] or 0
+        cart.save(update_fields=['item_count'])
+
+    # PostgreSQL: silinen satırların ertelenmiş FK tetikleyicileri hemen çalışsın. Yoksa aynı
+    # transaction'daki AddConstraint "pending trigger events" hatasıyla düşer.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_cart_item_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('cart_id', ''), _negated=True), fields=('cart_id',), name='unique_cart_id'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
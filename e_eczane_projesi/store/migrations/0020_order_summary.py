@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:09
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+SUMMARY_LENGTH = 255
+
+
+# store.models.order_summary'nin bu migration anındaki kopyası
+def order_summary(lines):
+    lines = list(lines)
+    parts = []
+    for index, (name, quantity) in enumerate(lines):
+        part = f"{name} x{quantity}" if quantity > 1 else name
+        rest = len(lines) - index - 1
+        tail = f" ve {rest} ürün daha" if rest else ""
+        if parts and len(', '.join(parts + [part]) + tail) > SUMMARY_LENGTH:
+            return ', '.join(parts) + f" ve {rest + 1} ürün daha"
+        parts.append(part)
+    return ', '.join(parts)[:SUMMARY_LENGTH]
+
+
+def fill_summaries(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    last_id = 0
+    while True:
+        orders = list(Order.objects.filter(id__gt=last_id).order_by('id').only('id')[:BATCH_SIZE])
+        if not orders:
+            break
+        last_id = orders[-1].id
+        items = (
+            OrderItem.objects.filter(order_id__in=[order.id for order in orders])
+            .order_by('order_id', 'id').values_list('order_id', 'product__name', 'quantity')
+        )
+        lines = {
+            order_id: [(name, quantity) for _, name, quantity in rows]
+            for order_id, rows in groupby(items, key=lambda row: row[0])
+        }
+        for order in orders:
+            order.item_count = sum(quantity for _, quantity in lines.get(order.id, []))
+            order.summary = order_summary(lines.get(order.id, []))
+        Order.objects.bulk_update(orders, ['item_count', 'summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ürün Adedi'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='summary',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Özet'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
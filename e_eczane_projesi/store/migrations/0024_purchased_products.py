@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+BATCH_SIZE = 1000
+
+
+def fill_purchases(apps, schema_editor):
+    OrderItem = apps.get_model('store', 'OrderItem')
+    PurchasedProduct = apps.get_model('store', 'PurchasedProduct')
+    rows = (
+        OrderItem.objects.values('order__user_id', 'product_id').order_by()
+        .annotate(first=models.Min('order__created_at'))
+    )
+    batch = []
+    for row in rows.iterator():
+        batch.append(PurchasedProduct(
+            user_id=row['order__user_id'], product_id=row['product_id'], first_purchased_at=row['first'],
+        ))
+        if len(batch) >= BATCH_SIZE:
+            PurchasedProduct.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    PurchasedProduct.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('store', '0023_product_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchasedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_purchased_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchases', to='store.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchases', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='purchasedproduct',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='unique_purchase'),
+        ),
+        migrations.RunPython(fill_purchases, migrations.RunPython.noop),
+    ]
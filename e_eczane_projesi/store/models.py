@@ -1,10 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Now
+from django.utils import timezone
+from .search import normalize
 
 # 1. Kategori Modeli
 class Category(models.Model):
     name = models.CharField(max_length=255, verbose_name="Kategori Adı")
     slug = models.SlugField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = 'Kategoriler'
@@ -25,39 +30,89 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Arama alanları (elle düzenlenmez, save() sırasında doldurulur)
+    search_name = models.CharField(max_length=255, blank=True, editable=False)
+    search_text = models.TextField(blank=True, editable=False)
+    # PostgreSQL'de veritabanı tetikleyicisi ile güncellenir (bkz. 0010_product_search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Onaylı yorumların özet puanı (Review sinyalleriyle güncellenir, bkz. store/ratings.py)
+    rating_sum = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+
+    # Sepetlerde ayrılmış (süresi dolmamış rezervasyonlardaki) adet toplamı, bkz. store/reservations.py
+    reserved = models.PositiveIntegerField(default=0, editable=False, verbose_name="Ayrılmış Adet")
+
     class Meta:
         verbose_name_plural = 'Ürünler'
+        indexes = [
+            # Ürün listesi keyset sayfalaması: (created_at, id) ve (price, id)
+            models.Index(fields=['is_active', 'created_at', 'id'], name='product_active_new_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='product_active_price_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        # Arama sütunlarını Türkçe harf katlaması yapılmış haliyle tut
+        self.search_name = normalize(self.name)
+        self.search_text = normalize(self.description)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'search_name', 'search_text'}
+        super().save(*args, **kwargs)
     
     def average_review(self):
-        reviews = self.reviews.filter(status=True).aggregate(average=models.Avg('rating'))
-        avg = 0
-        if reviews['average'] is not None:
-            avg = float(reviews['average'])
-        return avg
+        return self.rating_avg
 
     def count_review(self):
-        reviews = self.reviews.filter(status=True).aggregate(count=models.Count('id'))
-        count = 0
-        if reviews['count'] is not None:
-            count = int(reviews['count'])
-        return count
+        return self.rating_count
+
+    # Satılabilir adet: stok - sepetlerde ayrılmış olan
+    @property
+    def available(self):
+        return max(self.stock - self.reserved, 0)
+
+# Sepet satırı tutarı (adet x güncel fiyat), veritabanında hesaplanır
+CART_LINE_TOTAL = models.ExpressionWrapper(
+    models.F('quantity') * models.F('product__price'),
+    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+)
 
 # 3. Sepet (Cart) Modeli
 class Cart(models.Model):
     cart_id = models.CharField(max_length=250, blank=True, verbose_name="Sepet ID") 
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    # Sepetteki toplam adet (rozet için). Sepeti değiştiren her işlem F() ile günceller.
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Ürün Adedi")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # Oturum başına tek sepet (boş cart_id'ler hariç)
+            models.UniqueConstraint(fields=['cart_id'], condition=~models.Q(cart_id=''), name='unique_cart_id'),
+        ]
+
     def __str__(self):
         return str(self.cart_id)
 
+    # update() auto_now alanına dokunmuyor; updated_at'i elle ileri alıyoruz (boşta sepet temizliği buna bakıyor)
+    def adjust_item_count(self, delta):
+        Cart.objects.filter(pk=self.pk).update(item_count=models.F('item_count') + delta, updated_at=Now())
+
+    # Sayaç bir şekilde kayarsa (ör. ürün silinip sepet satırı kaskadla gitti) baştan hesapla
+    def recount_items(self):
+        total = self.items.aggregate(total=models.Sum('quantity'))['total'] or 0
+        Cart.objects.filter(pk=self.pk).update(item_count=total, updated_at=Now())
+        self.item_count = total
+
+    # Genel toplam veritabanında tek aggregate ile (satırlar ve ürünler belleğe alınmadan)
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.items.aggregate(total=models.Sum(CART_LINE_TOTAL))['total'] or 0
 
 # 4. Sepet Ürünü (CartItem) Modeli
 class CartItem(models.Model):
@@ -65,19 +120,72 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            # Bir üründen sepette tek satır; sepete ekleme bu kısıt üzerinden upsert yapıyor
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+    # cart_lines() ile gelen satırlarda tutar zaten hesaplanmış (line_total)
     @property
     def total_price(self):
+        if hasattr(self, 'line_total'):
+            return self.line_total
         return self.product.price * self.quantity
     # store/models.py dosyasının en altı
 
+# 4b. Stok Rezervasyonu: sepete eklenen adet bir süreliğine başkasına satılmaz.
+# Süresi dolanlar sweep_reservations komutuyla silinir ve Product.reserved düşülür.
+class StockReservation(models.Model):
+    cart = models.ForeignKey(Cart, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Bitiş")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_reservation'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} (sepet {self.cart_id})"
+
 # 5. Sipariş (Order) Modeli - Siparişin başlığı
+ORDER_SUMMARY_LENGTH = 255
+
+
+# Sipariş listesinde satırlara inmeden gösterilen özet: "Aspirin x2, C Vitamini ve 3 ürün daha"
+def order_summary(lines):
+    lines = list(lines)
+    parts = []
+    for index, (name, quantity) in enumerate(lines):
+        part = f"{name} x{quantity}" if quantity > 1 else name
+        rest = len(lines) - index - 1
+        tail = f" ve {rest} ürün daha" if rest else ""
+        if parts and len(', '.join(parts + [part]) + tail) > ORDER_SUMMARY_LENGTH:
+            return ', '.join(parts) + f" ve {rest + 1} ürün daha"
+        parts.append(part)
+    return ', '.join(parts)[:ORDER_SUMMARY_LENGTH]
+
+
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Sipariş Tarihi")
     total_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Toplam Tutar")
+    # Sipariş geçmişi listesi OrderItem'a inmesin diye sipariş anında yazılır
+    item_count = models.PositiveIntegerField(default=0, verbose_name="Ürün Adedi")
+    summary = models.CharField(max_length=ORDER_SUMMARY_LENGTH, blank=True, verbose_name="Özet")
+
+    class Meta:
+        indexes = [
+            # Sipariş geçmişi: kullanıcının siparişleri yeniden eskiye (keyset sayfalama)
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+            # Satış özetleri gün aralığındaki siparişleri tarıyor (bkz. store/rollups.py)
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Sipariş #{self.id} - {self.user.username}"
@@ -109,7 +217,8 @@ class UserActivityLog(models.Model):
     action = models.CharField(max_length=20, choices=ACTION_CHOICES, verbose_name="İşlem Türü")
     description = models.TextField(verbose_name="Açıklama")
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name="IP Adresi")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Zaman")
+    # Olayın gerçekleştiği an (toplu yazımda yazıldığı an değil, bkz. store/audit.py)
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="Zaman")
 
     def __str__(self):
         return f"{self.user} - {self.action} ({self.timestamp})"
@@ -132,5 +241,175 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Ürün sayfasındaki yorum akışı (keyset sayfalama)
+            models.Index(fields=['product', 'status', 'created_at', 'id'], name='review_feed_new_idx'),
+            models.Index(fields=['product', 'status', 'rating', 'id'], name='review_feed_rating_idx'),
+        ]
+
     def __str__(self):
         return self.subject       
+
+
+# 9. Arka Plan İşleri (veritabanı tabanlı iş kuyruğu, bkz. store/jobs.py)
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Bekliyor'),
+        (RUNNING, 'Çalışıyor'),
+        (DONE, 'Tamamlandı'),
+        (FAILED, 'Başarısız'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name="Görev")
+    payload = models.JSONField(default=dict, blank=True)
+    # Aynı iş iki kez kuyruğa girmesin (ör. 'order.placed:42'); boşsa kontrol yok
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Durum")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Deneme")
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(verbose_name="Çalışma Zamanı")
+    locked_by = models.CharField(max_length=36, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Arka Plan İşi'
+        verbose_name_plural = 'Arka Plan İşleri'
+        indexes = [
+            # İşçi sadece sırası gelmiş bekleyen işleri tarıyor
+            models.Index(fields=['status', 'run_at'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# 10. İdempotency Anahtarları (çift tıklama / tekrar gönderilen istekler, bkz. store/idempotency.py)
+class IdempotencyKey(models.Model):
+    # Giriş yapmış kullanıcı için 'u:<id>', ziyaretçi için 's:<oturum anahtarı>'
+    owner = models.CharField(max_length=50)
+    # Görünüm + parametreleri, ör. 'add_to_cart:42'
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=64)
+    # İlk istek sürerken boş; bitince yanıtı saklanır
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=500, blank=True)
+    body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} ({self.key})"
+
+
+# 11. Günlük Satış Özetleri (raporlar ham sipariş satırlarını taramasın, bkz. store/rollups.py)
+# "buyers" o gün o ürünü/kategoriyi alan farklı kullanıcı sayısı; günler arasında toplanamaz.
+class ProductSalesDaily(models.Model):
+    day = models.DateField(verbose_name="Gün")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0, verbose_name="Adet")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Ciro")
+    buyers = models.PositiveIntegerField(default=0, verbose_name="Alıcı")
+
+    class Meta:
+        verbose_name = 'Satış Raporu'
+        verbose_name_plural = 'Satış Raporu'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='unique_product_sales_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.product_id}"
+
+
+class CategorySalesDaily(models.Model):
+    day = models.DateField(verbose_name="Gün")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0, verbose_name="Adet")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Ciro")
+    buyers = models.PositiveIntegerField(default=0, verbose_name="Alıcı")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'category'], name='unique_category_sales_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.category_id}"
+
+
+# Artımlı işlerin kaldığı yer (ör. satış özetleri için işlenen son sipariş id'si)
+class RollupCheckpoint(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
+
+
+# 12. Birlikte Alınan Ürünler (aynı siparişte geçme sayısı; ürün başına sadece en güçlü
+# PAIRS_PER_PRODUCT eşleşme saklanır, bkz. store/pairs.py)
+class ProductPair(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='pairs')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='unique_product_pair'),
+        ]
+        indexes = [
+            # Ürün sayfası: bu ürünle en çok birlikte alınanlar (tek indeksli sorgu)
+            models.Index(fields=['product', '-count'], name='product_pair_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.related_id} ({self.count})"
+
+
+# 13. Popülerlik Puanları ("Çok Satanlar" / "Şu An Popüler", bkz. store/popularity.py)
+# Puanlar zamanla sönümlenen satış toplamının logaritması; boşsa hiç satılmamış.
+class ProductPopularity(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    bestseller = models.FloatField(null=True, blank=True)
+    trending = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-bestseller'], name='popularity_bestseller_idx'),
+            models.Index(fields=['-trending'], name='popularity_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.bestseller} / {self.trending}"
+
+
+# 14. Satın Alınan Ürünler (kullanıcı + ürün; sipariş anında yazılır, yorum yetkisi buradan
+# kontrol edilir, bkz. store/purchases.py)
+class PurchasedProduct(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='purchases')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='purchases')
+    first_purchased_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_purchase'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.product_id}"
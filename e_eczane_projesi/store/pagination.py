@@ -0,0 +1,124 @@
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+# Keyset (seek) sayfalama:
+# OFFSET kullanmadan "son gördüğüm satırdan sonrasını ver" diyoruz.
+# Böylece 1. sayfa da 500. sayfa da aynı hızda gelir ve araya yeni ürün girse bile
+# sayfalar kaymaz. İmleç (cursor) son satırın sıralama değerlerini taşır ve imzalıdır,
+# kullanıcı URL'de oynayıp sahte sorgu üretemez. İmleç hangi sıralama için üretildiğini de taşır;
+# başka bir sıralamayla (ör. ?sort değişmiş) gelen ya da çözülemeyen imleç ilk sayfaya düşer.
+
+CURSOR_SALT = 'store.pagination'
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    # ordering: ('-created_at', '-id') gibi; son alan mutlaka benzersiz olmalı (genelde id)
+    def __init__(self, queryset, ordering, per_page=24):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    # --- İmleç kodlama ---
+    def encode_cursor(self, obj, direction):
+        values = [self._serialize(getattr(obj, name)) for name, _ in self.keys]
+        return signing.dumps({'d': direction, 'o': self.ordering, 'v': values}, salt=CURSOR_SALT, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values = data['v']
+            direction = data['d']
+            ordering = tuple(data['o'])
+        except (signing.BadSignature, KeyError, TypeError):
+            return None, None
+        if direction not in ('next', 'prev') or ordering != self.ordering or len(values) != len(self.keys):
+            return None, None
+        try:
+            return direction, [self._deserialize(name, value) for (name, _), value in zip(self.keys, values)]
+        except (ValidationError, TypeError):
+            return None, None
+
+    def _serialize(self, value):
+        if value is None or isinstance(value, (int, float, str, bool)):
+            return value
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)  # Decimal
+
+    def _deserialize(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Anotasyon (ör. arama puanı 'rank'): değer anotasyonun kendi tipine çevrilir. Anotasyonun
+            # tipi sütunla aynı olmalı (rank float8'e Cast ediliyor, bkz. search.py); yoksa eşit
+            # değerli satırlar sayfa sınırında atlanır ya da tekrarlanır.
+            annotation = self.queryset.query.annotations.get(name)
+            if annotation is None or value is None:
+                return value
+            field = annotation.output_field
+        return field.to_python(value)
+
+    # --- Sorgu ---
+    def _seek(self, values, reverse):
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            forward = 'lt' if descending else 'gt'
+            backward = 'gt' if descending else 'lt'
+            step = Q(**{f'{name}__{backward if reverse else forward}': values[index]})
+            for prev_index, (prev_name, _) in enumerate(self.keys[:index]):
+                step &= Q(**{prev_name: values[prev_index]})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else (None, None)
+
+        queryset = self.queryset
+        if direction == 'prev':
+            queryset = queryset.filter(self._seek(values, reverse=True)).order_by(*self._reversed_ordering())
+        else:
+            if direction == 'next':
+                queryset = queryset.filter(self._seek(values, reverse=False))
+            queryset = queryset.order_by(*self.ordering)
+
+        # Bir fazla satır çekip sonraki sayfa var mı anlıyoruz (COUNT sorgusu yok)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'prev':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == 'next'
+
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'prev') if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,130 @@
+from collections import defaultdict
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Order, OrderItem, ProductPair, RollupCheckpoint
+from .rollups import SAFETY_LAG
+
+# "Birlikte sıkça alınanlar": aynı siparişte geçen ürün çiftleri sayılır ve her ürün için en çok
+# birlikte alınan PAIRS_PER_PRODUCT ürün ProductPair tablosunda tutulur. Ürün sayfası bu tablodan
+# (product, -count) indeksiyle tek sorgu okur. Komut: `python manage.py refresh_product_pairs`.
+# - Sayım siparişler üzerinde parça parça yapılır; bellekte ürün başına en fazla
+#   2 x CANDIDATES_PER_PRODUCT aday tutulur, aşılınca en zayıflar atılır (seyrek ve sınırlı).
+# - Artımlı çalışma: son kontrol noktasından sonraki siparişler sayılır, ilgili ürünlerin saklanan
+#   çiftleriyle toplanıp yeniden kırpılır. Kırpma yüzünden sayılar yaklaşıktır; ara sıra --full
+#   ile baştan hesaplamak sapmayı düzeltir.
+# - Çok satırlı siparişler (toplu alım) çift sayısını patlatıyor ve birliktelik sinyali taşımıyor;
+#   MAX_ORDER_LINES'tan fazla farklı ürün içerenler sayılmaz.
+
+PAIRS_CHECKPOINT = 'product_pairs'
+
+PAIRS_PER_PRODUCT = 20
+CANDIDATES_PER_PRODUCT = 4 * PAIRS_PER_PRODUCT
+
+MAX_ORDER_LINES = 30
+
+# Bir seferde okunan sipariş id aralığı
+ORDER_CHUNK = 2000
+
+# Ürün sayfasında gösterilen öneri sayısı
+RECOMMENDATIONS = 6
+
+
+class PairCounter:
+    def __init__(self, limit=CANDIDATES_PER_PRODUCT):
+        self.limit = limit
+        self.counts = defaultdict(dict)
+
+    def add(self, product, related, count=1):
+        row = self.counts[product]
+        row[related] = row.get(related, 0) + count
+        if len(row) > 2 * self.limit:
+            self.counts[product] = self.top(product, self.limit)
+
+    def add_order(self, product_ids):
+        if len(product_ids) > MAX_ORDER_LINES:
+            return
+        for product in product_ids:
+            for related in product_ids:
+                if product != related:
+                    self.add(product, related)
+
+    def top(self, product, limit):
+        row = self.counts[product]
+        best = sorted(row.items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+        return dict(best)
+
+
+def _count_orders(counter, start, end):
+    # (start, end] aralığındaki siparişler; parça parça, sipariş başına farklı ürünler
+    while start < end:
+        stop = min(start + ORDER_CHUNK, end)
+        lines = (
+            OrderItem.objects.filter(order_id__gt=start, order_id__lte=stop)
+            .order_by('order_id').values_list('order_id', 'product_id')
+        )
+        for _, rows in groupby(lines.iterator(), key=lambda row: row[0]):
+            counter.add_order({product_id for _, product_id in rows})
+        start = stop
+
+
+def _rows(counter, products):
+    return [
+        ProductPair(product_id=product, related_id=related, count=count)
+        for product in products
+        for related, count in counter.top(product, PAIRS_PER_PRODUCT).items()
+    ]
+
+
+def _high_water(start, lag):
+    return Order.objects.filter(pk__gt=start, created_at__lt=timezone.now() - lag).aggregate(high=Max('id'))['high']
+
+
+# Baştan hesapla (tablo tek transaction'da yeniden yazılır)
+def rebuild(lag=SAFETY_LAG):
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=PAIRS_CHECKPOINT)
+    high = _high_water(0, lag) or 0
+    counter = PairCounter()
+    _count_orders(counter, 0, high)
+
+    with transaction.atomic():
+        ProductPair.objects.all().delete()
+        ProductPair.objects.bulk_create(_rows(counter, list(counter.counts)), batch_size=1000)
+        RollupCheckpoint.objects.filter(pk=checkpoint.pk).update(position=high, updated_at=timezone.now())
+    return len(counter.counts)
+
+
+# Son kontrol noktasından sonraki siparişleri ekle. Güncellenen ürün sayısını döndürür.
+def refresh(lag=SAFETY_LAG):
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=PAIRS_CHECKPOINT)
+    high = _high_water(checkpoint.position, lag)
+    if high is None:
+        return 0
+    counter = PairCounter()
+    _count_orders(counter, checkpoint.position, high)
+    touched = list(counter.counts)
+
+    with transaction.atomic():
+        # Saklanan çiftlerle topla, tekrar kırp ve bu ürünlerin satırlarını yeniden yaz
+        stored = ProductPair.objects.filter(product_id__in=touched).values_list('product_id', 'related_id', 'count')
+        for product, related, count in stored.iterator():
+            counter.add(product, related, count)
+        ProductPair.objects.filter(product_id__in=touched).delete()
+        ProductPair.objects.bulk_create(_rows(counter, touched), batch_size=1000)
+        RollupCheckpoint.objects.filter(pk=checkpoint.pk).update(position=high, updated_at=timezone.now())
+    return len(touched)
+
+
+# Ürün sayfası için: satışta olan, en çok birlikte alınan ürünler (tek sorgu)
+def bought_together(product_id, limit=RECOMMENDATIONS):
+    pairs = (
+        ProductPair.objects.filter(product_id=product_id, related__is_active=True)
+        .select_related('related__category')
+        .only('related__id', 'related__name', 'related__slug', 'related__price', 'related__stock',
+              'related__reserved', 'related__image', 'related__category__slug')
+        .order_by('-count', 'related_id')[:limit]
+    )
+    return [pair.related for pair in pairs]
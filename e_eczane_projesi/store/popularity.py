@@ -0,0 +1,127 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln, Now
+
+from .models import Category, OrderItem, Product, ProductPopularity
+
+# Zamanla sönümlenen popülerlik: her satış, yarılanma süresi geçtikçe etkisi yarıya inen bir puan
+# katkısıdır. Tüm ürünleri her gün "yaşlandırmak" yerine sabit bir referans anı (EPOCH) kullanıyoruz:
+# t anındaki q adetlik satışın katkısı q * 2^((t - EPOCH) / yarılanma). Böylece eski puanlar hiç
+# güncellenmez, yeni satışlar sadece daha büyük katkı ekler; sıralama aynı kalır.
+# Bu katkılar zamanla taşacak kadar büyüdüğü için puanın logaritmasını saklıyoruz ve toplamayı
+# ln(e^a + e^b) = max(a, b) + ln(1 + e^-|a - b|) ile tek bir UPDATE içinde yapıyoruz.
+# - Puanlar sipariş commit olduktan sonra 'order.popularity' işiyle güncellenir (bkz. store/tasks.py).
+# - Listeler (genel ve kategori başına ilk TOP_N) önbellekte tutulur; süresi dolunca puan indeksinden
+#   tek sorguyla yeniden üretilir. refresh_popular komutu paylaşılan önbelleği önceden ısıtır.
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+BESTSELLER = 'bestseller'
+TRENDING = 'trending'
+
+HALF_LIVES = {
+    BESTSELLER: timedelta(days=30),
+    TRENDING: timedelta(days=1),
+}
+
+TOP_N = 6
+
+POPULAR_KEY = 'store:popular:{}:{}'
+POPULAR_TIMEOUT = 60 * 5
+
+# Şeritteki ürün kartı sütunları
+STRIP_FIELDS = ('id', 'name', 'slug', 'price', 'stock', 'reserved', 'image', 'category__id', 'category__slug')
+
+
+def log_weight(quantity, at, kind):
+    return math.log(quantity) + (at - EPOCH) / HALF_LIVES[kind] * math.log(2)
+
+
+def log_add(a, b):
+    if a is None:
+        return b
+    return max(a, b) + math.log1p(math.exp(-abs(a - b)))
+
+
+def _log_add_expression(kind, weights):
+    weight = Case(
+        *[When(product_id=product_id, then=Value(value)) for product_id, value in weights.items()],
+        output_field=FloatField(),
+    )
+    current = F(kind)
+    return Case(
+        When(**{f'{kind}__isnull': True}, then=weight),
+        default=Greatest(current, weight) + Ln(Value(1.0) + Exp(-Abs(current - weight))),
+        output_field=FloatField(),
+    )
+
+
+# Bir siparişin satışlarını puanlara ekle: {ürün id: adet}, siparişin zamanı. İki sorgu.
+def record_sales(quantities, at):
+    ProductPopularity.objects.bulk_create(
+        [ProductPopularity(product_id=product_id) for product_id in quantities], ignore_conflicts=True,
+    )
+    ProductPopularity.objects.filter(product_id__in=quantities).update(
+        updated_at=Now(),
+        **{
+            kind: _log_add_expression(kind, {
+                product_id: log_weight(quantity, at, kind) for product_id, quantity in quantities.items()
+            })
+            for kind in HALF_LIVES
+        },
+    )
+
+
+# Tüm puanları sipariş geçmişinden baştan hesapla (ilk kurulum / düzeltme)
+def rebuild():
+    scores = {}
+    lines = OrderItem.objects.order_by().values_list('product_id', 'quantity', 'order__created_at')
+    for product_id, quantity, at in lines.iterator(chunk_size=5000):
+        row = scores.setdefault(product_id, dict.fromkeys(HALF_LIVES))
+        for kind in HALF_LIVES:
+            row[kind] = log_add(row[kind], log_weight(quantity, at, kind))
+
+    with transaction.atomic():
+        ProductPopularity.objects.all().delete()
+        ProductPopularity.objects.bulk_create(
+            [ProductPopularity(product_id=product_id, **row) for product_id, row in scores.items()],
+            batch_size=1000,
+        )
+    return len(scores)
+
+
+def _key(kind, category_id):
+    return POPULAR_KEY.format(kind, category_id or 'all')
+
+
+# Listeyi puan indeksinden üretip önbelleğe yaz (satışta ve stokta olanlar)
+def materialize(kind, category_id=None, limit=TOP_N):
+    products = Product.objects.filter(
+        is_active=True, stock__gt=F('reserved'), **{f'popularity__{kind}__isnull': False},
+    )
+    if category_id:
+        products = products.filter(category_id=category_id)
+    products = list(
+        products.select_related('category').only(*STRIP_FIELDS).order_by(f'-popularity__{kind}', 'id')[:limit]
+    )
+    cache.set(_key(kind, category_id), products, POPULAR_TIMEOUT)
+    return products
+
+
+def popular_products(kind, category_id=None):
+    products = cache.get(_key(kind, category_id))
+    if products is None:
+        products = materialize(kind, category_id)
+    return products
+
+
+def materialize_all():
+    category_ids = [None, *Category.objects.values_list('id', flat=True)]
+    for category_id in category_ids:
+        for kind in HALF_LIVES:
+            materialize(kind, category_id)
+    return len(category_ids)
@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Product, PurchasedProduct
+
+# "Bu kullanıcı bu ürünü aldı mı?" sorusu (yorum yazma yetkisi) için OrderItem -> Order JOIN'i
+# yerine (user, product) tablosu. Sipariş transaction'ında yazılır; kullanıcının aldığı ürün
+# id'leri ayrıca önbellekte küme olarak tutulur, ürün sayfası kontrolü bellekte yapılır.
+# Önbellek başka bir süreçte eski kalmış olabileceğinden yazma yetkisi (submit_review) kümede
+# bulamazsa unique indeksten kesin cevabı alır.
+
+PURCHASED_KEY = 'store:purchased:{}'
+PURCHASED_TIMEOUT = 60 * 60
+
+REVIEWABLE_LIMIT = 6
+
+
+def _key(user_id):
+    return PURCHASED_KEY.format(user_id)
+
+
+# Sipariş transaction'ı içinde çağrılır (tek sorgu)
+def record_purchases(user_id, product_ids):
+    PurchasedProduct.objects.bulk_create(
+        [PurchasedProduct(user_id=user_id, product_id=product_id) for product_id in product_ids],
+        ignore_conflicts=True,
+    )
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
+
+
+def purchased_product_ids(user_id):
+    product_ids = cache.get(_key(user_id))
+    if product_ids is None:
+        product_ids = frozenset(PurchasedProduct.objects.filter(user_id=user_id).values_list('product_id', flat=True))
+        cache.set(_key(user_id), product_ids, PURCHASED_TIMEOUT)
+    return product_ids
+
+
+def has_purchased(user_id, product_id):
+    if product_id in purchased_product_ids(user_id):
+        return True
+    bought = PurchasedProduct.objects.filter(user_id=user_id, product_id=product_id).exists()
+    if bought:
+        cache.delete(_key(user_id))
+    return bought
+
+
+# Satın alınmış ama henüz yorumlanmamış ürünler
+def reviewable_products(user, limit=REVIEWABLE_LIMIT):
+    return list(
+        Product.objects.filter(is_active=True, purchases__user=user).exclude(reviews__user=user)
+        .select_related('category').only('id', 'name', 'slug', 'category__id', 'category__slug')
+        .order_by('-purchases__first_purchased_at', 'id')[:limit]
+    )
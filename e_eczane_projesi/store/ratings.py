@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Now
+
+from .cache import bump_product_versions
+from .models import Product, Review
+
+# Ürün puanları Product üzerinde saklanıyor (rating_sum, rating_count, rating_avg).
+# Her yorum değişikliğinde tek bir UPDATE ile artırıp azaltıyoruz; ortalama da aynı
+# ifadede hesaplanıyor. SQL'de SET tarafı eski değerleri gördüğü için üçü tutarlı kalır.
+
+
+# Onaylı yorumun puana katkısı: (puan, adet)
+def review_contribution(rating, status):
+    if not status:
+        return 0.0, 0
+    return float(rating), 1
+
+
+def apply_rating_delta(product_id, rating_delta, count_delta):
+    if not rating_delta and not count_delta:
+        return
+    new_sum = F('rating_sum') + rating_delta
+    new_count = F('rating_count') + count_delta
+    Product.objects.filter(pk=product_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_avg=Case(
+            When(rating_count__gt=-count_delta, then=new_sum / new_count),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        # Katalog API'sinin ETag / Last-Modified doğrulayıcısı updated_at'e bakıyor
+        updated_at=Now(),
+    )
+
+
+# Tüm değerleri yorum tablosundan baştan hesaplar (tek UPDATE); kart ve API önbellekleri de yenilenir.
+def rebuild_product_ratings(products):
+    product_ids = list(products.values_list('id', flat=True))
+    approved = Review.objects.filter(product=OuterRef('pk'), status=True).order_by().values('product')
+    rating_sum = Coalesce(
+        Subquery(approved.annotate(total=Sum('rating')).values('total')), Value(0.0), output_field=FloatField(),
+    )
+    rating_count = Coalesce(Subquery(approved.annotate(total=Count('id')).values('total')), Value(0))
+    updated = Product.objects.filter(pk__in=product_ids).update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating_avg=Coalesce(
+            Subquery(approved.annotate(average=Avg('rating')).values('average')), Value(0.0), output_field=FloatField(),
+        ),
+        updated_at=Now(),
+    )
+    transaction.on_commit(lambda: bump_product_versions(product_ids))
+    return updated
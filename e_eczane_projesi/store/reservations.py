@@ -0,0 +1,147 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+from .cache import bump_product_versions
+from .models import CartItem, Product, StockReservation
+
+# Stok rezervasyonları.
+# Üye sepetine eklenen her adet RESERVATION_MINUTES dakika boyunca o sepete ayrılır; bu sürede
+# başka sepetler o adedi göremez. Product.reserved tüm rezervasyon satırlarının toplamıdır
+# (liste/detay sayfası satılabilir adedi stock - reserved olarak bu sayaçtan okur, satır toplamaz).
+# - Tek ürün ekleme: sayaç koşullu UPDATE ile artırılır (stock - reserved >= adet), yarışta fazla ayırma olmaz.
+# - Toplu işlemler (birleştirme, tekrar sipariş, toplu sepet): ürün satırları id sırasıyla kilitlenir,
+#   sınırlar hesaplanır, sepetin rezervasyonları satırlarla eşitlenir ve etkilenen ürünlerin
+#   sayacı satırlardan yeniden hesaplanır.
+# - Süresi dolanlar sweep_reservations komutuyla (expires_at indeksli) parça parça silinir.
+# Ziyaretçi sepetleri oturumda durduğu için rezervasyon almaz; giriş yapınca birleştirmede alınır.
+
+RESERVATION_MINUTES = 15
+
+SWEEP_BATCH_SIZE = 1000
+
+# Ayırabildiyse kalan satılabilir adedi döndürür, yetmediyse satır dönmez
+RESERVE_SQL = """
+    UPDATE {product} SET reserved = reserved + %s, updated_at = %s
+    WHERE id = %s AND is_active AND stock - reserved >= %s
+    RETURNING stock - reserved
+"""
+
+UPSERT_HOLD_SQL = """
+    INSERT INTO {hold} (cart_id, product_id, quantity, expires_at) VALUES (%s, %s, %s, %s)
+    ON CONFLICT (cart_id, product_id) DO UPDATE
+    SET quantity = {hold}.quantity + excluded.quantity, expires_at = excluded.expires_at
+"""
+
+
+def _sql(template):
+    return template.format(product=Product._meta.db_table, hold=StockReservation._meta.db_table)
+
+
+def expiry():
+    return timezone.now() + timedelta(minutes=RESERVATION_MINUTES)
+
+
+# Sayacı rezervasyon satırlarından yeniden hesapla (tek UPDATE). updated_at de ileri alınır:
+# API'nin stokta bilgisi satılabilir adetten hesaplanıyor (bkz. store/api.py).
+def recount_reserved(product_ids):
+    totals = StockReservation.objects.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+        total=Sum('quantity'),
+    ).values('total')
+    Product.objects.filter(pk__in=product_ids).update(reserved=Coalesce(Subquery(totals), Value(0)), updated_at=Now())
+
+
+# Ürün satırlarını id sırasıyla kilitle (toplu işlemler sınırı stock - reserved'ten hesaplamadan önce).
+# Eşzamanlı iki toplu işlem ya da tek ekleme aynı ürünün satılabilir adedini birlikte okuyamaz;
+# sıralı kilit ödemedeki kilitle aynı sırada olduğu için kilitlenme olmaz.
+def lock_products(product_ids):
+    product_ids = sorted(set(product_ids))
+    if product_ids:
+        list(Product.objects.select_for_update().filter(pk__in=product_ids).order_by('id').values_list('id', flat=True))
+
+
+def _bump_on_commit(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: bump_product_versions(product_ids))
+
+
+# Tek ürün ayır (sepete ekleme). Ayrıldıysa True. Transaction içinde çağrılmalı; sepet satırı da
+# aynı transaction'da yazılıyor.
+def reserve(cart, product_id, quantity=1):
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(RESERVE_SQL), [
+            quantity, connection.ops.adapt_datetimefield_value(timezone.now()), product_id, quantity,
+        ])
+        row = cursor.fetchone()
+    if row is None:
+        return False
+
+    expires_at = expiry()
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(UPSERT_HOLD_SQL), [
+            cart.pk, product_id, quantity, connection.ops.adapt_datetimefield_value(expires_at),
+        ])
+    # Sepet kullanıldıkça diğer rezervasyonlarının da süresi uzar
+    StockReservation.objects.filter(cart=cart).exclude(product_id=product_id).update(expires_at=expires_at)
+
+    # Sadece bu ürünün sürümü: kartı ve detay sayfası yenilenir ("Tükendi" dahil),
+    # katalog önbellekleri (öneri, filtreler) etkilenmez
+    _bump_on_commit([product_id])
+    return True
+
+
+# Sepetin rezervasyonlarını satırlarıyla eşitle (toplu sepet işlemlerinden sonra)
+def sync_holds(cart):
+    with transaction.atomic():
+        holds = StockReservation.objects.filter(cart=cart)
+        product_ids = set(holds.values_list('product_id', flat=True))
+        holds.delete()
+
+        expires_at = expiry()
+        lines = list(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity'))
+        StockReservation.objects.bulk_create([
+            StockReservation(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at)
+            for product_id, quantity in lines
+        ])
+        product_ids.update(product_id for product_id, _ in lines)
+        recount_reserved(product_ids)
+        _bump_on_commit(product_ids)
+
+
+# Rezervasyonları bırak (satır silme, sepet temizliği). product_ids verilmezse sepetlerin tümü.
+def release_holds(cart_ids, product_ids=None):
+    holds = StockReservation.objects.filter(cart_id__in=cart_ids)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=product_ids)
+    with transaction.atomic():
+        released = set(holds.values_list('product_id', flat=True))
+        if not released:
+            return
+        holds.delete()
+        recount_reserved(released)
+        _bump_on_commit(released)
+
+
+# Süresi dolan rezervasyonları parça parça sil; her parça kendi kısa transaction'ında
+def sweep_expired(product_ids=None, batch_size=SWEEP_BATCH_SIZE):
+    expired = StockReservation.objects.filter(expires_at__lte=timezone.now())
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=product_ids)
+
+    swept = 0
+    while True:
+        rows = list(expired.order_by('expires_at').values_list('id', 'product_id')[:batch_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            swept += StockReservation.objects.filter(id__in=[pk for pk, _ in rows]).delete()[0]
+            touched = {product_id for _, product_id in rows}
+            recount_reserved(touched)
+            _bump_on_commit(touched)
+        if len(rows) < batch_size:
+            break
+    return swept
@@ -0,0 +1,91 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CategorySalesDaily, Order, OrderItem, ProductSalesDaily, RollupCheckpoint
+
+# Günlük satış özetleri (ürün ve kategori bazında adet, ciro, farklı alıcı).
+# refresh_sales_rollups komutu son çalıştığı yerden (işlenen en büyük sipariş id'si) devam eder:
+# yeni siparişlerin düştüğü günleri bulur ve o günleri baştan hesaplar. Gün tamamen yeniden
+# yazıldığı için farklı alıcı sayısı doğru kalır ve komut iki kez çalışsa da sonuç değişmez.
+# - Sipariş id'si commit'ten önce alınıyor; daha küçük id'li bir sipariş geç commit olabilir.
+#   Bu yüzden son SAFETY_LAG içindeki siparişler bir sonraki çalışmaya bırakılıyor.
+# - Günler TIME_ZONE'a göre; kategori, ürünün şu anki kategorisi.
+
+SALES_CHECKPOINT = 'sales_rollup'
+
+SAFETY_LAG = timedelta(minutes=5)
+
+# Tam yeniden hesaplamada bir transaction'da işlenen gün sayısı
+DAYS_PER_CHUNK = 31
+
+LINE_REVENUE = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _aggregate(lines, group_field):
+    return (
+        lines.annotate(day=TruncDate('order__created_at')).values('day', group_field).order_by()
+        .annotate(units=Sum('quantity'), revenue=Sum(LINE_REVENUE), buyers=Count('order__user', distinct=True))
+    )
+
+
+# [first, last] günlerini siparişlerden yeniden hesapla (tek transaction)
+def rebuild_days(first, last):
+    start, end = _day_start(first), _day_start(last + timedelta(days=1))
+    lines = OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+
+    with transaction.atomic():
+        ProductSalesDaily.objects.filter(day__gte=first, day__lte=last).delete()
+        CategorySalesDaily.objects.filter(day__gte=first, day__lte=last).delete()
+        ProductSalesDaily.objects.bulk_create([
+            ProductSalesDaily(day=row['day'], product_id=row['product'], units=row['units'],
+                              revenue=row['revenue'], buyers=row['buyers'])
+            for row in _aggregate(lines, 'product')
+        ], batch_size=1000)
+        CategorySalesDaily.objects.bulk_create([
+            CategorySalesDaily(day=row['day'], category_id=row['product__category'], units=row['units'],
+                               revenue=row['revenue'], buyers=row['buyers'])
+            for row in _aggregate(lines, 'product__category')
+        ], batch_size=1000)
+
+
+# Son kontrol noktasından sonraki siparişlerin günlerini yenile. full=True ise her şeyi baştan.
+# Yenilenen gün sayısını döndürür.
+def refresh(full=False, lag=SAFETY_LAG):
+    checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=SALES_CHECKPOINT)
+    start = 0 if full else checkpoint.position
+    new_orders = Order.objects.filter(pk__gt=start, created_at__lt=timezone.now() - lag)
+
+    high = new_orders.aggregate(high=Max('id'))['high']
+    if high is None:
+        return 0
+    new_orders = new_orders.filter(pk__lte=high)
+
+    if full:
+        bounds = new_orders.aggregate(first=Min('created_at'), last=Max('created_at'))
+        first = timezone.localdate(bounds['first'])
+        last = timezone.localdate(bounds['last'])
+        days = [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+    else:
+        days = sorted(set(
+            new_orders.annotate(day=TruncDate('created_at')).order_by().values_list('day', flat=True).distinct()
+        ))
+
+    # Ardışık günleri tek aralıkta hesapla (artımlı çalışmada genelde bugün + dün)
+    refreshed = 0
+    while days:
+        run = [days.pop(0)]
+        while days and days[0] == run[-1] + timedelta(days=1) and len(run) < DAYS_PER_CHUNK:
+            run.append(days.pop(0))
+        rebuild_days(run[0], run[-1])
+        refreshed += len(run)
+
+    RollupCheckpoint.objects.filter(pk=checkpoint.pk).update(position=high, updated_at=timezone.now())
+    return refreshed
@@ -0,0 +1,81 @@
+import re
+
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+# Türkçe harfleri aramada tek biçime indiriyoruz.
+# Python'un lower() fonksiyonu 'İ' harfini 'i̇' (noktalı i + birleşik nokta) yapıyor,
+# 'I' harfini de 'ı' yerine 'i' yapıyor. Kullanıcı "agri", "AĞRI" ya da "ağrı" yazsa da
+# aynı ürünü bulsun diye hepsini ASCII karşılığına çeviriyoruz.
+TURKISH_FOLD = str.maketrans({
+    'İ': 'i', 'I': 'i', 'ı': 'i',
+    'Ş': 's', 'ş': 's',
+    'Ğ': 'g', 'ğ': 'g',
+    'Ü': 'u', 'ü': 'u',
+    'Ö': 'o', 'ö': 'o',
+    'Ç': 'c', 'ç': 'c',
+    'Â': 'a', 'â': 'a',
+    'Î': 'i', 'î': 'i',
+    'Û': 'u', 'û': 'u',
+})
+
+# to_tsquery'ye sadece harf ve rakam gönderiyoruz (operatör enjeksiyonu olmasın)
+TERM_RE = re.compile(r'\w+')
+
+# Metni zaten kendimiz katladığımız için PostgreSQL'in 'simple' sözlüğü yeterli.
+# search_vector tetikleyicisi ve GIN indeksleri 0010_product_search migration'ında.
+SEARCH_CONFIG = 'simple'
+
+
+# Metni aramaya uygun hale getirir: Türkçe harf katlama + küçük harf + tek boşluk
+def normalize(text):
+    if not text:
+        return ''
+    return ' '.join(text.translate(TURKISH_FOLD).lower().split())
+
+
+def search_terms(query):
+    return TERM_RE.findall(normalize(query))
+
+
+# Ürünleri arama kelimesine göre filtreler ve 'rank' alanı ile puanlar.
+# PostgreSQL'de: search_vector (ad A, açıklama B ağırlıklı) üzerinde tam metin araması
+# + yazım hatalarına karşı search_name üzerinde trigram benzerliği. İkisi de GIN indeksli.
+# Diğer veritabanlarında (testlerdeki SQLite): katlanmış sütunlarda contains araması.
+def search_products(queryset, query):
+    terms = search_terms(query)
+    if not terms:
+        return queryset.annotate(rank=Value(0.0, output_field=FloatField())).none()
+
+    folded = ' '.join(terms)
+
+    if connection.vendor == 'postgresql':
+        # "agri kes" -> 'agri:* & kes:*' (yazarken arama için önek eşleşmesi)
+        ts_query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            search_type='raw',
+            config=SEARCH_CONFIG,
+        )
+        # ts_rank ve similarity real (float4) döndürür; imleçteki değer float8 olarak geri geliyor.
+        # Karşılaştırma aynı tipte olmazsa eşit puanlı satırlar sayfa sınırında atlanır/tekrarlanır.
+        return queryset.annotate(
+            rank=Cast(SearchRank(F('search_vector'), ts_query) + TrigramSimilarity('search_name', folded), FloatField()),
+        ).filter(
+            Q(search_vector=ts_query) | Q(TrigramSimilar(F('search_name'), Value(folded)))
+        )
+
+    # --- SQLite / test yolu ---
+    condition = Q()
+    rank = Value(0.0, output_field=FloatField())
+    for term in terms:
+        condition &= Q(search_name__contains=term) | Q(search_text__contains=term)
+        # Adda geçen kelime açıklamada geçenden daha değerli
+        rank = rank + Case(
+            When(search_name__contains=term, then=Value(1.0)),
+            default=Value(0.4),
+            output_field=FloatField(),
+        )
+    return queryset.filter(condition).annotate(rank=rank)
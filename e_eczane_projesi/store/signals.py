@@ -1,6 +1,12 @@
 from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import UserActivityLog
+from .cart import merge_session_cart
+from .cache import CATALOG_VERSION, CATEGORY_VERSION, bump_product_version, bump_version
+from .audit import log_activity
+from .models import Category, Product, Review
+from .ratings import apply_rating_delta, review_contribution
+from .suggest import prefix_index
 
 # IP bulma fonksiyonunu buraya da kopyalayalım veya import edelim
 def get_client_ip(request):
@@ -13,18 +19,110 @@ def get_client_ip(request):
 
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
-    UserActivityLog.objects.create(
-        user=user,
-        action='LOGIN',
-        description=f"{user.username} sisteme giriş yaptı.",
-        ip_address=get_client_ip(request)
-    )
+    log_activity('LOGIN', f"{user.username} sisteme giriş yaptı.", user=user, ip_address=get_client_ip(request))
+
+# Giriş öncesi oturumda biriken sepeti kalıcı sepete tek seferde aktar
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        merge_session_cart(request, user)
 
 @receiver(user_logged_out)
 def log_user_logout(sender, request, user, **kwargs):
-    UserActivityLog.objects.create(
-        user=user,
-        action='LOGOUT',
-        description=f"{user.username} sistemden çıkış yaptı.",
-        ip_address=get_client_ip(request)
-    )
\ No newline at end of file
+    log_activity('LOGOUT', f"{user.username} sistemden çıkış yaptı.", user=user, ip_address=get_client_ip(request))
+
+# --- ÜRÜN PUANI (Product.rating_*) ---
+# Yorum kaydedilmeden önce eski halini alıyoruz ki farkı (delta) uygulayabilelim.
+# Admin'deki list_editable 'status' değişikliği de save() üzerinden buraya düşer.
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, **kwargs):
+    instance._rating_before = None
+    if instance.pk:
+        instance._rating_before = (
+            Review.objects.filter(pk=instance.pk).values_list('product_id', 'rating', 'status').first()
+        )
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    before = getattr(instance, '_rating_before', None)
+    new_rating, new_count = review_contribution(instance.rating, instance.status)
+
+    if before is None:
+        apply_rating_delta(instance.product_id, new_rating, new_count)
+        return
+
+    old_product_id, old_rating, old_status = before
+    old_rating, old_count = review_contribution(old_rating, old_status)
+    if old_product_id == instance.product_id:
+        apply_rating_delta(instance.product_id, new_rating - old_rating, new_count - old_count)
+    else:
+        apply_rating_delta(old_product_id, -old_rating, -old_count)
+        apply_rating_delta(instance.product_id, new_rating, new_count)
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    rating, count = review_contribution(instance.rating, instance.status)
+    apply_rating_delta(instance.product_id, -rating, -count)
+
+
+# --- ÖNBELLEK SÜRÜMLERİ (store/cache.py) ---
+# Admin'den (list_editable fiyat/stok dahil) yapılan her değişiklik save() ile buraya
+# gelir; ürünün kartı ve detayı bir sonraki istekte yeniden üretilir. Katalog sayacı
+# (öneri indeksi, filtre adetleri) sadece katalog alanları değiştiyse artar.
+CATALOG_FIELDS = ('name', 'slug', 'category_id', 'price', 'is_active')
+
+def _touches_catalog(update_fields):
+    return update_fields is None or bool(set(update_fields) & {*CATALOG_FIELDS, 'category'})
+
+@receiver(pre_save, sender=Product)
+def remember_catalog_state(sender, instance, update_fields=None, **kwargs):
+    instance._catalog_before = None
+    if instance.pk and _touches_catalog(update_fields):
+        instance._catalog_before = (
+            Product.objects.filter(pk=instance.pk).values_list(*CATALOG_FIELDS).first()
+        )
+
+@receiver(post_save, sender=Product)
+def bump_saved_product_version(sender, instance, created, update_fields=None, **kwargs):
+    bump_product_version(instance.pk)
+    if not _touches_catalog(update_fields):
+        return
+    before = getattr(instance, '_catalog_before', None)
+    if created or before != tuple(getattr(instance, field) for field in CATALOG_FIELDS):
+        bump_version(CATALOG_VERSION)
+
+@receiver(post_delete, sender=Product)
+def bump_deleted_product_version(sender, instance, **kwargs):
+    bump_product_version(instance.pk)
+    bump_version(CATALOG_VERSION)
+
+# Yorum eklenince/düzenlenince/onay durumu değişince detay sayfası önbelleği yenilenir
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_review_product_version(sender, instance, **kwargs):
+    bump_product_version(instance.product_id)
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_category_version(sender, **kwargs):
+    # Kart linkleri kategori slug'ını içeriyor; kartlar bu sayacı da anahtarında taşıyor
+    bump_version(CATEGORY_VERSION)
+
+
+# --- ARAMA ÖNERİ İNDEKSİ (store/suggest.py) ---
+# Sürüm sayaçları yukarıda artırıldıktan sonra çalışmalı (kayıt sırası önemli).
+@receiver(post_save, sender=Product)
+def patch_suggest_product(sender, instance, **kwargs):
+    prefix_index.update_product(instance)
+
+@receiver(post_delete, sender=Product)
+def unpatch_suggest_product(sender, instance, **kwargs):
+    prefix_index.remove_product(instance.pk)
+
+@receiver(post_save, sender=Category)
+def patch_suggest_category(sender, instance, **kwargs):
+    prefix_index.update_category(instance)
+
+@receiver(post_delete, sender=Category)
+def unpatch_suggest_category(sender, instance, **kwargs):
+    prefix_index.remove_category(instance.pk)
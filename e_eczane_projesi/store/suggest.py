@@ -0,0 +1,151 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.urls import reverse
+
+from .cache import CATALOG_VERSION, CATEGORY_VERSION, get_versions
+from .search import normalize
+
+# Arama kutusu için "yazarken öneri" indeksi.
+# Ürün ve kategori adlarının normalize edilmiş hallerini sıralı bir listede tutuyoruz,
+# önek araması bisect ile O(log n). Veritabanına hiç gitmiyor.
+# - İlk istekte (worker açıldıktan sonra) bir kere kuruluyor.
+# - Product/Category kaydedilip silindikçe sinyallerle yerinde güncelleniyor.
+# - Başka bir süreç kataloğu değiştirdiyse (paylaşılan önbellekteki sürüm sayaçları farklıysa)
+#   baştan kuruluyor.
+
+SUGGEST_LIMIT = 8
+
+# Bir sorguda en fazla bu kadar eşleşmeye bakıp aralarından en iyileri seçiliyor
+SCAN_LIMIT = 200
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []        # (anahtar, tür, id) sıralı
+        self._entries = {}     # (tür, id) -> {'label', 'slug', 'category_id', 'keys'}
+        self._versions = None  # kurulduğu/güncellendiği andaki sürüm sayaçları
+
+    # Her kelimeden başlayan son ekler: "agri kesici" -> "agri kesici", "kesici"
+    @staticmethod
+    def _keys_for(label):
+        words = normalize(label).split()
+        return [' '.join(words[index:]) for index in range(len(words))]
+
+    def _add(self, kind, pk, label, slug, category_id=None, keep_sorted=True):
+        keys = self._keys_for(label)
+        self._entries[(kind, pk)] = {'label': label, 'slug': slug, 'category_id': category_id, 'keys': keys}
+        for key in keys:
+            if keep_sorted:
+                insort(self._keys, (key, kind, pk))
+            else:
+                self._keys.append((key, kind, pk))
+
+    def _remove(self, kind, pk):
+        entry = self._entries.pop((kind, pk), None)
+        if entry is None:
+            return
+        for key in entry['keys']:
+            index = bisect_left(self._keys, (key, kind, pk))
+            if index < len(self._keys) and self._keys[index] == (key, kind, pk):
+                del self._keys[index]
+
+    def _current_versions(self):
+        return get_versions(CATALOG_VERSION, CATEGORY_VERSION)
+
+    def build(self):
+        from .models import Category, Product
+
+        with self._lock:
+            versions = self._current_versions()
+            self._keys = []
+            self._entries = {}
+            # Toplu kurulumda tek tek insort yerine en sonda bir kere sırala
+            for pk, name, slug in Category.objects.values_list('id', 'name', 'slug'):
+                self._add('category', pk, name, slug, keep_sorted=False)
+            products = Product.objects.filter(is_active=True).values_list('id', 'name', 'slug', 'category_id')
+            for pk, name, slug, category_id in products.iterator(chunk_size=2000):
+                self._add('product', pk, name, slug, category_id, keep_sorted=False)
+            self._keys.sort()
+            self._versions = versions
+
+    def _ensure_built(self):
+        if self._versions is None or self._versions != self._current_versions():
+            self.build()
+
+    # --- Sinyallerden çağrılan yerinde güncellemeler ---
+    def _patch(self, change):
+        if self._versions is None:
+            return  # Henüz kurulmadı, ilk sorguda zaten güncel haliyle kurulacak
+        with self._lock:
+            change()
+            self._versions = self._current_versions()
+
+    def update_product(self, product):
+        def change():
+            self._remove('product', product.pk)
+            if product.is_active:
+                self._add('product', product.pk, product.name, product.slug, product.category_id)
+        self._patch(change)
+
+    def remove_product(self, product_id):
+        self._patch(lambda: self._remove('product', product_id))
+
+    def update_category(self, category):
+        def change():
+            self._remove('category', category.pk)
+            self._add('category', category.pk, category.name, category.slug)
+        self._patch(change)
+
+    def remove_category(self, category_id):
+        self._patch(lambda: self._remove('category', category_id))
+
+    # --- Sorgu ---
+    def _url(self, kind, entry):
+        if kind == 'category':
+            return reverse('product_list_by_category', args=[entry['slug']])
+        category = self._entries.get(('category', entry['category_id']))
+        if category is None:
+            return None
+        return reverse('product_detail', args=[category['slug'], entry['slug']])
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self._ensure_built()
+
+        with self._lock:
+            keys = self._keys
+            matches = {}
+            index = bisect_left(keys, (prefix,))
+            scanned = 0
+            while index < len(keys) and scanned < SCAN_LIMIT and keys[index][0].startswith(prefix):
+                key, kind, pk = keys[index]
+                # Adın başından eşleşme, ortadaki bir kelimeden eşleşmeden önce gelir
+                from_start = self._entries[(kind, pk)]['keys'][0] == key
+                current = matches.get((kind, pk))
+                if current is None or (from_start and not current):
+                    matches[(kind, pk)] = from_start
+                index += 1
+                scanned += 1
+
+            # Sıralama: baştan eşleşenler, önce kategoriler, sonra kısa adlar
+            ranked = sorted(
+                matches.items(),
+                key=lambda item: (not item[1], item[0][0] != 'category', len(self._entries[item[0]]['label'])),
+            )
+            suggestions = []
+            for (kind, pk), _ in ranked:
+                entry = self._entries[(kind, pk)]
+                url = self._url(kind, entry)
+                if url is None:
+                    continue
+                suggestions.append({'label': entry['label'], 'type': kind, 'url': url})
+                if len(suggestions) >= limit:
+                    break
+            return suggestions
+
+
+prefix_index = PrefixIndex()
@@ -0,0 +1,71 @@
+from django.core.mail import send_mail
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .audit import log_activity
+from .jobs import enqueue, task
+from .models import Order, OrderItem
+from .popularity import record_sales
+
+# Siparişten sonra yapılacak işler. İstek içinde değil, run_jobs işçisinde çalışırlar;
+# ödeme isteğinin süresi buraya eklenen her yeni iş için uzamaz.
+# Her görev tekrar çalıştırılabilir olmalı (bkz. store/jobs.py).
+
+
+# Sipariş transaction'ı içinde çağrılır: işler siparişle birlikte commit olur.
+# Sipariş yeni oluştuğu için aynı iş ikinci kez kuyruğa giremez; dedupe_key gerekmiyor.
+def schedule_order_followups(order, ip_address=None):
+    at = timezone.now().isoformat()
+    enqueue('order.activity_log', {
+        'order_id': order.pk,
+        'user_id': order.user_id,
+        'ip_address': ip_address,
+        'at': at,
+    })
+    enqueue('order.confirmation_email', {'order_id': order.pk})
+    enqueue('order.popularity', {'order_id': order.pk, 'at': at})
+
+
+@task('order.activity_log')
+def log_order(order_id, user_id, ip_address=None, at=None):
+    order = Order.objects.filter(pk=order_id).values('total_price').first()
+    if order is None:
+        return  # Sipariş bu arada silinmiş
+    # Log zamanı işin çalıştığı an değil, siparişin verildiği an olsun. İşin "tamamlandı"
+    # işaretiyle aynı transaction'da yazılsın diye tampona değil doğrudan (sync)
+    log_activity(
+        'ORDER',
+        f"Sipariş verildi. Tutar: {order['total_price']} TL. Sipariş ID: {order_id}",
+        user_id=user_id,
+        ip_address=ip_address,
+        timestamp=parse_datetime(at) if at else None,
+        sync=True,
+    )
+
+
+@task('order.confirmation_email', max_attempts=8)
+def send_order_confirmation(order_id):
+    order = Order.objects.select_related('user').filter(pk=order_id).first()
+    if order is None or not order.user.email:
+        return
+    lines = [
+        f"- {item.product.name} x {item.quantity} = {item.price * item.quantity} TL"
+        for item in order.items.select_related('product')
+    ]
+    send_mail(
+        f"Siparişiniz alındı (#{order.pk})",
+        "\n".join([f"Merhaba {order.user.username},", "", *lines, "", f"Toplam: {order.total_price} TL"]),
+        None,
+        [order.user.email],
+    )
+
+
+# Çok satanlar / popüler puanları (bkz. store/popularity.py). Puan güncellemesi işin "tamamlandı"
+# işaretiyle aynı transaction'da yazıldığı için sipariş iki kez sayılmaz.
+@task('order.popularity')
+def update_popularity(order_id, at):
+    quantities = {}
+    for product_id, quantity in OrderItem.objects.filter(order_id=order_id).values_list('product_id', 'quantity'):
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if quantities:
+        record_sales(quantities, parse_datetime(at))
@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+# Sözlükten değişken anahtarla değer okuma: {{ sozluk|get_item:anahtar }}
+@register.filter
+def get_item(mapping, key):
+    return mapping.get(key)
@@ -1,3 +1,1316 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Count, Sum
+from django.template import RequestContext, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .audit import AuditLogWriter, _process_start, recover_spool
+from .cache import CATALOG_VERSION, bump_product_versions, get_version, product_version_name
+from .cart import SESSION_CART_KEY, CartOperationError, add_many, add_one, fold_operations, get_or_create_cart
+from .jobs import claim, enqueue, run_job, run_pending, task
+from .checkout import EmptyCart, OutOfStock, place_order
+from .context_processors import cart_count
+from .models import (
+    ORDER_SUMMARY_LENGTH, Cart, CartItem, Category, CategorySalesDaily, Job, Order, OrderItem, Product,
+    ProductPair, ProductPopularity, ProductSalesDaily, PurchasedProduct, Review, RollupCheckpoint, StockReservation, UserActivityLog, order_summary,
+)
+from .facets import IN_STOCK, PRICE_BANDS, FacetFilters, facet_counts, price_band_condition
+from .pagination import KeysetPaginator
+from .reservations import recount_reserved, release_holds, sweep_expired, sync_holds
+from .search import normalize, search_products, search_terms
+from .suggest import PrefixIndex, prefix_index
+from .views import REVIEWS_PER_PAGE
+from .popularity import BESTSELLER, TRENDING, popular_products, rebuild as rebuild_popularity
+from .purchases import has_purchased, purchased_product_ids
+from .pairs import PairCounter, bought_together, rebuild as rebuild_pairs, refresh as refresh_pairs
+from .rollups import refresh
+
+
+# Giriş/çıkış logları testlerde arka plan iş parçacığına bırakılmadan hemen yazılsın
+sync_audit_log = override_settings(AUDIT_LOG={'BATCH_SIZE': 1})
+
+
+def make_product(category, slug, stock, price='10.00'):
+    return Product.objects.create(category=category, name=slug.upper(), slug=slug, price=Decimal(price), stock=stock)
+
+
+def make_cart(user, quantities):
+    cart = Cart.objects.create(cart_id=f'test-{user.pk}', user=user)
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product=product, quantity=quantity) for product, quantity in quantities.items()
+    ])
+    cart.recount_items()
+    return cart
+
+
+# Sepeti kurup sipariş ver. ago verilirse sipariş (ve popülerlik işinin olay zamanı) o kadar geriye alınır.
+def buy(user, quantities, ago=None):
+    Cart.objects.filter(user=user).delete()
+    order = place_order(user, make_cart(user, quantities))
+    if ago is not None:
+        at = timezone.now() - ago
+        Order.objects.filter(pk=order.pk).update(created_at=at)
+        Job.objects.filter(name='order.popularity', payload__order_id=order.pk).update(
+            payload={'order_id': order.pk, 'at': at.isoformat()},
+        )
+    return order
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alici', password='x')
+        self.category = Category.objects.create(name='Vitamin', slug='vitamin')
+
+    def test_places_order_and_decrements_stock(self):
+        first = make_product(self.category, 'c-vitamini', stock=5, price='12.50')
+        second = make_product(self.category, 'd-vitamini', stock=3)
+        cart = make_cart(self.user, {first: 2, second: 3})
+
+        order = place_order(self.user, cart)
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.stock, second.stock), (3, 0))
+        self.assertEqual(order.total_price, Decimal('55.00'))
+        self.assertEqual(order.items.count(), 2)
+        self.assertFalse(cart.items.exists())
+        self.assertEqual(Cart.objects.get(pk=cart.pk).item_count, 0)
+
+    def test_out_of_stock_rolls_back_everything(self):
+        enough = make_product(self.category, 'c-vitamini', stock=5)
+        short = make_product(self.category, 'd-vitamini', stock=1)
+        cart = make_cart(self.user, {enough: 2, short: 2})
+
+        with self.assertRaises(OutOfStock) as raised:
+            place_order(self.user, cart)
+
+        self.assertEqual(raised.exception.products, ['D-VITAMINI'])
+        enough.refresh_from_db()
+        self.assertEqual(enough.stock, 5)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(cart.items.count(), 2)
+
+    def test_empty_cart(self):
+        cart = make_cart(self.user, {})
+        with self.assertRaises(EmptyCart):
+            place_order(self.user, cart)
+
+    def test_query_count_does_not_depend_on_line_count(self):
+        products = [make_product(self.category, f'urun-{index}', stock=10) for index in range(8)]
+        cart = make_cart(self.user, {product: 1 for product in products})
+        # Savepoint, sepet kilidi, satırlar, ürün kilitleri, rezervasyonlar, stok UPDATE, sipariş, satırlar,
+        # satın alma kayıtları, sepet boşaltma (2; rezervasyon yoksa silme sorgusu atlanır), sonraki işler (3),
+        # savepoint bitişi
+        with self.assertNumQueries(15):
+            place_order(self.user, cart)
+
+    def test_checkout_keeps_catalog_caches_warm(self):
+        product = make_product(self.category, 'c-vitamini', stock=5)
+        cache.clear()
+        prefix_index.suggest('c-vit')
+        catalog = get_version(CATALOG_VERSION)
+        card = get_version(product_version_name(product.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, make_cart(self.user, {product: 1}))
+
+        # Stok değişti: ürünün kendi sürümü artar, katalog (öneri indeksi, filtreler) aynı kalır
+        self.assertEqual(get_version(CATALOG_VERSION), catalog)
+        self.assertNotEqual(get_version(product_version_name(product.pk)), card)
+        with self.assertNumQueries(0):
+            prefix_index.suggest('c-vit')
+
+
+class CartConstraintTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Maske', slug='maske')
+        self.product = make_product(self.category, 'maske', stock=5)
+        self.cart = make_cart(User.objects.create_user('alici', password='x'), {})
+
+    def test_repeated_adds_increment_a_single_line(self):
+        for _ in range(3):
+            self.assertTrue(add_one(self.cart, self.product.pk))
+        add_many(self.cart, {self.product.pk: 1})
+
+        self.assertEqual(list(self.cart.items.values_list('quantity', flat=True)), [4])
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.item_count, 4)
+
+    def test_duplicate_line_is_rejected(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+
+    def test_cart_id_is_unique_except_blank(self):
+        self.assertEqual(get_or_create_cart(self.cart.cart_id).pk, self.cart.pk)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cart.objects.create(cart_id=self.cart.cart_id)
+        Cart.objects.create(cart_id='')
+        Cart.objects.create(cart_id='')
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Maske', slug='maske')
+        self.product = make_product(category, 'maske', stock=5)
+
+    def post(self, operations):
+        return self.client.post(
+            '/cart/batch/', json.dumps({'operations': operations}), content_type='application/json',
+        )
+
+    def test_operations_fold_to_net_result(self):
+        adds, sets, removes = fold_operations([
+            {'op': 'add', 'product_id': 1, 'quantity': 2},
+            {'op': 'add', 'product_id': '1'},
+            {'op': 'remove', 'product_id': 2},
+            {'op': 'add', 'product_id': 2, 'quantity': 4},
+            {'op': 'set', 'product_id': 3, 'quantity': 0},
+        ])
+        self.assertEqual((adds, sets, removes), ({1: 3}, {2: 4}, [3]))
+
+    def test_out_of_range_quantities_are_rejected(self):
+        for quantity in (1e20, 10 ** 20, 10 ** 4 + 1, -1, 0, 2.0, True, 'iki', None):
+            with self.subTest(quantity=quantity):
+                with self.assertRaises(CartOperationError):
+                    fold_operations([{'op': 'add', 'product_id': self.product.pk, 'quantity': quantity}])
+                response = self.post([{'op': 'add', 'product_id': self.product.pk, 'quantity': quantity}])
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post([{'op': 'add', 'product_id': 10 ** 20}]).status_code, 400)
+        # bigint aralığındaki id'ler geçerli
+        self.assertEqual(fold_operations([{'op': 'add', 'product_id': 2 ** 31}]), ({2 ** 31: 1}, {}, []))
+
+    def test_batch_is_capped_by_stock(self):
+        response = self.post([{'op': 'add', 'product_id': self.product.pk, 'quantity': 10 ** 4}])
+        self.assertEqual(response.json(), {'items': {str(self.product.pk): 5}, 'item_count': 5})
+
+
+@sync_audit_log
+class SessionCartTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Maske', slug='maske')
+        self.mask = make_product(category, 'maske', stock=3)
+        self.cologne = make_product(category, 'kolonya', stock=5)
+        self.user = User.objects.create_user('alici', password='x')
+
+    def test_guest_cart_lives_in_the_session(self):
+        for _ in range(4):
+            self.client.get(f'/add-to-cart/{self.mask.pk}/')
+        self.client.get(f'/add-to-cart/{self.cologne.pk}/')
+
+        # Stok sınırında durur, veritabanına sepet ya da rezervasyon yazılmaz
+        self.assertEqual(self.client.session[SESSION_CART_KEY], {str(self.mask.pk): 3, str(self.cologne.pk): 1})
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.client.get('/cart/').context['quantity'], 4)
+
+    def test_login_merges_the_session_cart_into_the_user_cart(self):
+        make_cart(self.user, {self.mask: 1})
+        sync_holds(Cart.objects.get(user=self.user))
+        self.client.get(f'/add-to-cart/{self.mask.pk}/')
+        self.client.get(f'/add-to-cart/{self.mask.pk}/')
+        self.client.get(f'/add-to-cart/{self.cologne.pk}/')
+
+        self.client.post('/accounts/login/', {'username': 'alici', 'password': 'x'})
+
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(dict(cart.items.values_list('product_id', 'quantity')), {self.mask.pk: 3, self.cologne.pk: 1})
+        self.assertEqual(cart.item_count, 4)
+        self.assertEqual(dict(cart.reservations.values_list('product_id', 'quantity')), {self.mask.pk: 3, self.cologne.pk: 1})
+        self.assertNotIn(SESSION_CART_KEY, self.client.session)
+
+    def test_merge_is_capped_by_units_held_elsewhere(self):
+        other = make_cart(User.objects.create_user('baska', password='x'), {})
+        add_one(other, self.mask.pk)
+        add_one(other, self.mask.pk)
+        session = self.client.session
+        session[SESSION_CART_KEY] = {str(self.mask.pk): 3}
+        session.save()
+
+        self.client.post('/accounts/login/', {'username': 'alici', 'password': 'x'})
+        self.assertEqual(Cart.objects.get(user=self.user).items.get().quantity, 1)
+        self.mask.refresh_from_db()
+        self.assertEqual(self.mask.reserved, 3)
+
+
+class PurgeCartsTests(TestCase):
+    def setUp(self):
+        self.product = make_product(Category.objects.create(name='Maske', slug='maske'), 'maske', stock=10)
+        self.old_guest = self.guest_cart('eski', days=40)
+        self.recent_guest = self.guest_cart('yeni', days=5)
+        self.old_member = make_cart(User.objects.create_user('uye', password='x'), {self.product: 1})
+        Cart.objects.filter(pk=self.old_member.pk).update(updated_at=timezone.now() - timedelta(days=40))
+        Session.objects.create(session_key='suresi-dolmus', session_data='', expire_date=timezone.now() - timedelta(days=1))
+
+    def guest_cart(self, key, days):
+        written = timezone.now() - timedelta(days=days)
+        Session.objects.create(
+            session_key=key, session_data='', expire_date=written + timedelta(seconds=settings.SESSION_COOKIE_AGE),
+        )
+        cart = Cart.objects.create(cart_id=key)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        StockReservation.objects.create(cart=cart, product=self.product, quantity=2, expires_at=timezone.now())
+        Cart.objects.filter(pk=cart.pk).update(updated_at=written)
+        return cart
+
+    def purge(self, *args):
+        out = StringIO()
+        call_command('purge_carts', '--chunk-size', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_idle_guest_carts_and_expired_sessions_are_removed(self):
+        recount_reserved([self.product.pk])
+        self.assertIn('1 sepet, 1 sepet satırı, 2 oturum silindi', self.purge())
+
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {self.recent_guest.pk, self.old_member.pk})
+        self.assertFalse(CartItem.objects.filter(cart_id=self.old_guest.pk).exists())
+        self.assertEqual(set(Session.objects.values_list('session_key', flat=True)), {'yeni'})
+        # Silinen sepetin ayırdığı adet ürüne geri döner
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 2)
+
+    def test_include_users_and_custom_age(self):
+        self.purge('--days', '3', '--include-users')
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_dry_run_counts_without_deleting(self):
+        self.assertIn('1 sepet, 1 sepet satırı, 2 oturum silinecek', self.purge('--dry-run'))
+        self.assertEqual(Cart.objects.count(), 3)
+        self.assertEqual(Session.objects.count(), 3)
+
+
+@sync_audit_log
+class CartPageTests(TestCase):
+    def test_cart_page_query_count_does_not_grow_with_lines(self):
+        category = Category.objects.create(name='Maske', slug='maske')
+        user = User.objects.create_user('alici', password='x')
+        make_cart(user, {make_product(category, f'urun-{index}', stock=5, price=f'{index + 1}.50'): index + 1 for index in range(6)})
+        self.client.force_login(user)
+
+        # Oturum, kullanıcı, sepet, satırlar + toplamlar (pencere fonksiyonu), rozet
+        with self.assertNumQueries(5):
+            response = self.client.get('/cart/')
+        self.assertEqual(len(response.context['cart_items']), 6)
+        self.assertEqual(response.context['quantity'], 21)
+        self.assertEqual(response.context['total'], sum(Decimal(f'{index + 1}.50') * (index + 1) for index in range(6)))
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Maske', slug='maske')
+        self.product = make_product(self.category, 'maske', stock=2)
+        self.first = make_cart(User.objects.create_user('birinci', password='x'), {})
+        self.second = make_cart(User.objects.create_user('ikinci', password='x'), {})
+
+    def test_add_to_cart_holds_stock_for_other_carts(self):
+        self.assertTrue(add_one(self.first, self.product.pk))
+        self.assertTrue(add_one(self.first, self.product.pk))
+        self.assertFalse(add_one(self.second, self.product.pk))
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved, self.product.available), (2, 0))
+        self.assertEqual(self.first.reservations.get().quantity, 2)
+
+    def test_holds_bump_only_the_product_version(self):
+        catalog = get_version(CATALOG_VERSION)
+        card = get_version(product_version_name(self.product.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            add_one(self.first, self.product.pk)
+            add_one(self.first, self.product.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            release_holds([self.first.pk])
+            sweep_expired()
+
+        self.assertGreater(get_version(product_version_name(self.product.pk)), card)
+        self.assertEqual(get_version(CATALOG_VERSION), catalog)
+
+    def test_expired_holds_are_swept_and_freed(self):
+        add_one(self.first, self.product.pk)
+        add_one(self.first, self.product.pk)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        # Dolu görünen ürün için ekleme süresi dolanları temizleyip tekrar dener
+        self.assertTrue(add_one(self.second, self.product.pk))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 1)
+        self.assertEqual(sweep_expired(), 0)
+
+    def test_batch_add_is_capped_by_available_and_synced(self):
+        add_one(self.first, self.product.pk)
+        add_many(self.second, {self.product.pk: 5})
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 2)
+        self.assertEqual(self.second.items.get().quantity, 1)
+
+    def test_checkout_consumes_own_hold(self):
+        add_one(self.first, self.product.pk)
+        add_one(self.first, self.product.pk)
+        place_order(self.first.user, self.first)
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_recounts_holds_without_lines(self):
+        other = make_product(self.category, 'eldiven', stock=3)
+        add_one(self.first, self.product.pk)
+        add_one(self.first, other.pk)
+        # Satırı silinmiş ama rezervasyonu kalmış ürün sayaçta sızıntı bırakmamalı
+        self.first.items.filter(product=other).delete()
+        place_order(self.first.user, self.first)
+
+        other.refresh_from_db()
+        self.assertEqual((other.stock, other.reserved), (3, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class CheckoutAddRaceTests(TransactionTestCase):
+    def test_add_during_checkout_waits_for_the_cart_lock(self):
+        category = Category.objects.create(name='Maske', slug='maske')
+        ordered = make_product(category, 'maske', stock=2)
+        added = make_product(category, 'eldiven', stock=2)
+        user = User.objects.create_user('alici', password='x')
+        cart = make_cart(user, {ordered: 1})
+
+        def add():
+            try:
+                add_one(cart, added.pk)
+            finally:
+                connection.close()
+
+        adder = threading.Thread(target=add)
+        with transaction.atomic():
+            # Ödeme sepet kilidini almış, satırları okumuş durumda
+            Cart.objects.select_for_update().get(pk=cart.pk)
+            adder.start()
+            adder.join(timeout=0.5)
+            self.assertTrue(adder.is_alive())
+            place_order(user, cart)
+        adder.join()
+
+        # Ekleme siparişten sonra boş sepete düşer; satırı, rezervasyonu ve rozeti korunur
+        self.assertEqual(list(cart.items.values_list('product_id', 'quantity')), [(added.pk, 1)])
+        self.assertEqual(Cart.objects.get(pk=cart.pk).item_count, 1)
+        added.refresh_from_db()
+        self.assertEqual((added.stock, added.reserved), (2, 1))
+        self.assertEqual(list(StockReservation.objects.values_list('product_id', flat=True)), [added.pk])
+
+
+class SearchNormalizeTests(TestCase):
+    def test_dotted_and_dotless_i_fold_the_same(self):
+        for text in ('İLAÇ', 'ilaç', 'ILAÇ', 'ılaç', 'İlaç'):
+            with self.subTest(text=text):
+                self.assertEqual(normalize(text), 'ilac')
+
+    def test_turkish_letters_and_whitespace(self):
+        self.assertEqual(normalize('  AĞRI   Kesici\tŞurup '), 'agri kesici surup')
+        self.assertEqual(normalize('Çocuk Öksürük Güneş Kâğıt'), 'cocuk oksuruk gunes kagit')
+        self.assertEqual(normalize(None), '')
+        self.assertEqual(search_terms('"ağrı" & kes:*'), ['agri', 'kes'])
+
+    def test_search_ignores_case_and_diacritics(self):
+        category = Category.objects.create(name='İlaç', slug='ilac')
+        product = Product.objects.create(
+            category=category, name='AĞRI KESİCİ', slug='agri-kesici', price=Decimal('10.00'), stock=1,
+        )
+        make_product(category, 'kolonya', stock=1)
+        for query in ('agri', 'Ağrı', 'AGRI KES', 'ağrı kesici'):
+            with self.subTest(query=query):
+                self.assertEqual(list(search_products(Product.objects.all(), query)), [product])
+
+    @skipUnless(connection.vendor == 'postgresql', "Trigram benzerliği PostgreSQL'de")
+    def test_typo_still_matches(self):
+        category = Category.objects.create(name='İlaç', slug='ilac')
+        product = Product.objects.create(
+            category=category, name='Parasetamol Tablet', slug='parasetamol', price=Decimal('10.00'), stock=1,
+        )
+        self.assertIn(product, search_products(Product.objects.all(), 'parasetmol'))
+
+
+class ProductRatingTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Krem', slug='krem')
+        self.product = make_product(self.category, 'krem', stock=1)
+        self.other = make_product(self.category, 'losyon', stock=1)
+        self.users = [User.objects.create_user(f'yorumcu{index}', password='x') for index in range(3)]
+
+    def review(self, user, rating, product=None, status=True):
+        return Review.objects.create(product=product or self.product, user=user, rating=rating, status=status)
+
+    def assertRating(self, product, rating_sum, rating_count, rating_avg):
+        product.refresh_from_db()
+        self.assertEqual((product.rating_sum, product.rating_count), (rating_sum, rating_count))
+        self.assertAlmostEqual(product.rating_avg, rating_avg)
+
+    def test_review_changes_adjust_the_aggregates(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.review(self.users[0], 4)
+        # Ürün satırı okunmadan tek UPDATE ile artırılır
+        update = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertIn('"rating_sum" +', update[0])
+        second = self.review(self.users[1], 2)
+        self.review(self.users[2], 5, status=False)  # Onaysız yorum sayılmaz
+        self.assertRating(self.product, 6, 2, 3)
+
+        first.rating = 5
+        first.save()
+        self.assertRating(self.product, 7, 2, 3.5)
+
+        second.status = False
+        second.save()
+        self.assertRating(self.product, 5, 1, 5)
+
+        second.status = True
+        second.product = self.other
+        second.save()
+        self.assertRating(self.product, 5, 1, 5)
+        self.assertRating(self.other, 2, 1, 2)
+
+        first.delete()
+        self.assertRating(self.product, 0, 0, 0)
+
+    def test_rebuild_ratings_command_recomputes_from_reviews(self):
+        self.review(self.users[0], 3)
+        self.review(self.users[1], 4)
+        self.review(self.users[0], 1, product=self.other)
+        Product.objects.update(rating_sum=99, rating_count=9, rating_avg=11)
+
+        version = get_version(product_version_name(self.product.pk))
+        other_version = get_version(product_version_name(self.other.pk))
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_ratings', '--product', str(self.product.pk), stdout=out)
+        self.assertIn('1 ürün', out.getvalue())
+        self.assertRating(self.product, 7, 2, 3.5)
+        self.assertRating(self.other, 99, 9, 11)
+        # Kart ve API önbellekleri sadece yeniden hesaplanan ürün için yenilenir
+        self.assertGreater(get_version(product_version_name(self.product.pk)), version)
+        self.assertEqual(get_version(product_version_name(self.other.pk)), other_version)
+
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.assertRating(self.other, 1, 1, 1)
+
+
+class ProductCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Krem', slug='krem')
+        self.product = make_product(category, 'krem', stock=3)
+        self.other = make_product(category, 'losyon', stock=3)
+
+    def test_warm_list_renders_cards_from_cache(self):
+        self.client.get('/')
+        # Sadece sayfanın ürün satırları; kartlar, menü, filtreler ve şeritler önbellekten
+        with self.assertNumQueries(1):
+            self.client.get('/')
+
+    def test_product_save_invalidates_only_its_card(self):
+        self.client.get('/')
+        self.product.name = 'Nemlendirici Krem'
+        self.product.save()
+        # Sinyalsiz değişiklik: diğer kartın önbelleği hâlâ eski adı göstermeli
+        Product.objects.filter(pk=self.other.pk).update(name='Yeni Losyon')
+
+        content = self.client.get('/').content.decode()
+        self.assertIn('Nemlendirici Krem', content)
+        self.assertIn('LOSYON', content)
+        self.assertNotIn('Yeni Losyon', content)
+
+
+@sync_audit_log
+class ProductDetailQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Krem', slug='krem')
+        self.product = make_product(category, 'krem', stock=3)
+        for index in range(3):
+            user = User.objects.create_user(f'yorumcu{index}', password='x')
+            Review.objects.create(product=self.product, user=user, rating=4, subject=f'Yorum {index}')
+        self.url = f'/krem/{self.product.slug}/'
+        self.client.get(self.url)  # Ortak kısım önbelleğe alınsın
+
+    def test_anonymous_view_is_one_query(self):
+        # Sadece "birlikte alınanlar" şeridi; ürün, yorumlar ve puan önbellekten
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['reviews']), 3)
+
+    def test_logged_in_view_has_fixed_query_count(self):
+        user = User.objects.create_user('alici', password='x')
+        self.client.force_login(user)
+        self.client.get(self.url)
+        # Oturum, kullanıcı, sepette mi + satın almış mı, kendi yorumu, birlikte alınanlar, sepet rozeti
+        with self.assertNumQueries(6):
+            self.client.get(self.url)
+
+
+class ReviewFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Krem', slug='krem')
+        self.product = make_product(category, 'krem', stock=3)
+        for index in range(23):
+            user = User.objects.create_user(f'yorumcu{index}', password='x')
+            # Eşit puanlar ve birkaç onaysız yorum
+            Review.objects.create(product=self.product, user=user, rating=index % 3 + 3, subject=f'Yorum {index}',
+                                  status=index % 7 != 0)
+        self.approved = Review.objects.filter(product=self.product, status=True)
+
+    def walk(self, cursor=None, sort='new'):
+        subjects = []
+        while True:
+            with self.assertNumQueries(1):
+                data = self.client.get(f'/reviews/{self.product.pk}/', {'sort': sort, 'cursor': cursor or ''}).json()
+            self.assertLessEqual(len(data['reviews']), REVIEWS_PER_PAGE)
+            subjects += [review['subject'] for review in data['reviews']]
+            cursor = data['next']
+            if not cursor:
+                return subjects
+
+    def test_feed_pages_cover_every_approved_review_once(self):
+        expected = list(self.approved.order_by('-created_at', '-id').values_list('subject', flat=True))
+        self.assertEqual(len(expected), 19)
+        self.assertEqual(self.walk(), expected)
+
+        by_rating = list(self.approved.order_by('-rating', '-id').values_list('subject', flat=True))
+        self.assertEqual(self.walk(sort='rating'), by_rating)
+
+    def test_detail_page_continues_into_the_feed(self):
+        response = self.client.get(f'/krem/{self.product.slug}/')
+        first = [review.subject for review in response.context['reviews']]
+        rest = self.walk(response.context['reviews_next_cursor'])
+        self.assertEqual(first + rest, list(self.approved.order_by('-created_at', '-id').values_list('subject', flat=True)))
+
+    def test_bad_cursor_starts_from_the_first_page(self):
+        data = self.client.get(f'/reviews/{self.product.pk}/', {'cursor': 'bozuk', 'sort': 'yok'}).json()
+        self.assertEqual(len(data['reviews']), REVIEWS_PER_PAGE)
+
+
+class FacetCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.categories = [Category.objects.create(name=name, slug=slug) for name, slug in (('Krem', 'krem'), ('Vitamin', 'vitamin'))]
+        prices = ('10.00', '49.99', '50.00', '99.00', '100.00', '249.99', '250.00', '900.00')
+        for index, price in enumerate(prices * 2):
+            product = make_product(self.categories[index % 2], f'urun-{index}', stock=index % 3, price=price)
+            if index % 5 == 0:
+                name = f'Maske {index}'
+                Product.objects.filter(pk=product.pk).update(name=name, search_name=normalize(name))
+        # Stoğu olup tamamı sepetlerde ayrılmış ürün stokta sayılmaz
+        Product.objects.filter(stock=2).filter(pk__in=Product.objects.order_by('id').values('pk')[:6]).update(reserved=2)
+        Product.objects.filter(pk=make_product(self.categories[0], 'pasif', stock=5).pk).update(is_active=False)
+
+    def expected(self, filters, category, query):
+        products = Product.objects.filter(is_active=True)
+        if query:
+            products = search_products(products, query)
+        in_category = products.filter(category=category) if category else products
+        return {
+            'categories': {
+                row['category_id']: row['n']
+                for row in filters.apply(products).order_by().values('category_id').annotate(n=Count('id'))
+            },
+            'total': filters.apply(in_category).count(),
+            'in_stock': in_category.filter(IN_STOCK & filters.price_condition).count(),
+            'bands': [
+                [key, label, in_category.filter(price_band_condition(key) & filters.stock_condition).count()]
+                for key, label, _, _ in PRICE_BANDS
+            ],
+        }
+
+    def test_counts_match_filtered_querysets(self):
+        for category in (None, *self.categories):
+            for price in (None, '0-50', '50-100', '250-'):
+                for in_stock in (False, True):
+                    for query in (None, 'maske'):
+                        filters = FacetFilters(price=price, in_stock=in_stock)
+                        with self.subTest(category=category, price=price, in_stock=in_stock, query=query):
+                            products = Product.objects.filter(is_active=True)
+                            if query:
+                                products = search_products(products, query)
+                            counts = facet_counts(products, filters, category, query)
+                            expected = self.expected(filters, category, query)
+                            self.assertEqual({pk: n for pk, n in counts['categories'].items() if n}, expected['categories'])
+                            self.assertEqual(counts['total'], expected['total'])
+                            self.assertEqual(counts['in_stock'], expected['in_stock'])
+                            self.assertEqual(counts['bands'], expected['bands'])
+
+    def test_counts_are_cached_until_the_catalog_changes(self):
+        filters = FacetFilters(price='0-50')
+        products = Product.objects.filter(is_active=True)
+        first = facet_counts(products, filters)
+        with self.assertNumQueries(0):
+            self.assertEqual(facet_counts(products, filters), first)
+
+        make_product(self.categories[0], 'yeni', stock=1, price='20.00')
+        self.assertEqual(facet_counts(Product.objects.filter(is_active=True), filters)['total'], first['total'] + 1)
+
+    def test_in_stock_count_follows_checkout(self):
+        filters = FacetFilters()
+        products = Product.objects.filter(is_active=True)
+        before = facet_counts(products, filters)['in_stock']
+        product = products.filter(IN_STOCK).first()
+        user = User.objects.create_user('alici', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(user, make_cart(user, {product: product.stock - product.reserved}))
+
+        # Sipariş katalog sayacına dokunmaz ama stoktakiler adedi hemen güncellenir
+        self.assertEqual(facet_counts(Product.objects.filter(is_active=True), filters)['in_stock'], before - 1)
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Ağrı Kesici', slug='agri-kesici')
+        for name, slug in (('Ağrı Kesici Jel', 'jel'), ('Kas Ağrısı Kremi', 'kas-kremi'), ('Aspirin', 'aspirin')):
+            Product.objects.create(category=self.category, name=name, slug=slug, price=Decimal('10.00'), stock=1)
+        self.index = PrefixIndex()
+
+    def labels(self, query):
+        return [suggestion['label'] for suggestion in self.index.suggest(query)]
+
+    def test_prefix_matches_rank_start_of_name_and_categories_first(self):
+        # Baştan eşleşenler önce (kategori üründen önce), sonra bir kelimenin başından eşleşen
+        self.assertEqual(self.labels('AĞR'), ['Ağrı Kesici', 'Ağrı Kesici Jel', 'Kas Ağrısı Kremi'])
+        self.assertEqual(self.labels('kes'), ['Ağrı Kesici', 'Ağrı Kesici Jel'])
+        self.assertEqual(self.labels('a'), ['Ağrı Kesici', 'Aspirin', 'Ağrı Kesici Jel', 'Kas Ağrısı Kremi'])
+        self.assertEqual(self.labels('xyz'), [])
+        self.assertEqual(self.labels('  '), [])
+        self.assertEqual(len(self.index.suggest('a', limit=2)), 2)
+        self.assertEqual(self.index.suggest('asp')[0]['url'], '/agri-kesici/aspirin/')
+
+    def test_index_rebuilds_after_catalog_change(self):
+        self.labels('a')
+        with self.assertNumQueries(0):
+            self.labels('a')
+
+        # Bu indeksi sinyaller güncellemiyor (başka bir süreç gibi); sürüm değişince baştan kurulur
+        Product.objects.create(category=self.category, name='Asetilsistein', slug='asetilsistein',
+                               price=Decimal('10.00'), stock=1)
+        self.assertIn('Asetilsistein', self.labels('ase'))
+        Product.objects.filter(slug='aspirin').get().delete()
+        self.assertEqual(self.labels('asp'), [])
+
+    def test_signals_patch_the_shared_index_in_place(self):
+        prefix_index.build()
+        product = Product.objects.get(slug='aspirin')
+        product.name = 'Aspirin Forte'
+        product.save()
+        product.is_active = False
+        Product.objects.create(category=self.category, name='Asit Giderici', slug='asit', price=Decimal('10.00'), stock=1)
+        with self.assertNumQueries(0):
+            self.assertEqual([s['label'] for s in prefix_index.suggest('as')], ['Asit Giderici', 'Aspirin Forte'])
+        product.save()
+        self.assertEqual([s['label'] for s in prefix_index.suggest('as')], ['Asit Giderici'])
+
+    def test_suggest_endpoint(self):
+        response = self.client.get('/suggest/', {'q': 'jel'})
+        self.assertEqual(response.json()['suggestions'], [
+            {'label': 'Ağrı Kesici Jel', 'type': 'product', 'url': '/agri-kesici/jel/'},
+        ])
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Krem', slug='krem')
+        self.product = make_product(self.category, 'krem', stock=1)
+        make_product(self.category, 'losyon', stock=3)
+
+    def test_if_none_match_returns_304_without_touching_the_database(self):
+        for url in ('/api/products/', '/api/products/?category=krem', f'/api/products/{self.product.pk}/', '/api/categories/'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_returns_304_until_a_change(self):
+        url = f'/api/products/{self.product.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.product.price = Decimal('12.00')
+        self.product.updated_at = timezone.now() + timedelta(seconds=2)
+        Product.objects.filter(pk=self.product.pk).update(price=self.product.price, updated_at=self.product.updated_at)
+        bump_product_versions([self.product.pk])
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['price'], '12.00')
+
+    def test_reservation_changes_list_validator_and_in_stock(self):
+        etag = self.client.get('/api/products/')['ETag']
+        cart = make_cart(User.objects.create_user('alici', password='x'), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            add_one(cart, self.product.pk)
+
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        rows = {row['id']: row for row in json.loads(b''.join(response.streaming_content))}
+        self.assertEqual((rows[self.product.pk]['stock'], rows[self.product.pk]['in_stock']), (1, False))
+        self.assertTrue(self.client.get(f'/api/products/{self.product.pk + 1}/').json()['in_stock'])
+
+    def test_malformed_category_is_404(self):
+        for category in ('krem\n', 'krem%0A', 'kr"em', 'kremé'):
+            with self.subTest(category=category):
+                self.assertEqual(self.client.get('/api/products/', {'category': category}).status_code, 404)
+        self.assertNotIn('krem', self.client.get('/api/products/?category=krem')['ETag'])
+
+    def test_deleted_product_changes_the_list_etag(self):
+        etag = self.client.get('/api/products/')['ETag']
+        Product.objects.get(slug='losyon').delete()
+        self.assertNotEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/products/999/').status_code, 404)
+
+
+class CartBadgeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alici', password='x')
+        product = make_product(Category.objects.create(name='Krem', slug='krem'), 'krem', stock=5)
+        make_cart(self.user, {product: 3})
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = {}
+
+    def render(self, source):
+        return Template(source).render(RequestContext(self.request, processors=[cart_count]))
+
+    def test_pages_without_the_badge_run_no_cart_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render('<h1>Kampanyalar</h1>'), '<h1>Kampanyalar</h1>')
+
+    def test_badge_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render('{{ cart_item_count }} {{ cart_item_count }}'), '3 3')
+
+    def test_guest_badge_reads_the_session(self):
+        self.request.user = AnonymousUser()
+        self.request.session = {SESSION_CART_KEY: {'1': 2, '2': 1}}
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render('{{ cart_item_count }}'), '3')
+
+
+class SearchPaginationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Maske', slug='maske')
+        # Adda geçenler ve sadece açıklamada geçenler: iki puan grubu, her grupta çok sayıda eşitlik
+        for index in range(7):
+            make_product(category, f'maske-{index}', stock=1)
+        for index in range(6):
+            Product.objects.create(
+                category=category, name=f'Eldiven {index}', slug=f'eldiven-{index}', price=Decimal('5.00'),
+                stock=1, description='Maske ile birlikte kullanılır',
+            )
+        make_product(category, 'kolonya', stock=1)
+
+    def test_relevance_pages_have_no_gaps_or_duplicates(self):
+        products = search_products(Product.objects.filter(is_active=True), 'maske')
+        paginator = KeysetPaginator(products, ('-rank', 'id'), per_page=4)
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            with self.assertNumQueries(1):
+                page = paginator.page(cursor)
+            seen.extend(product.pk for product in page)
+            pages += 1
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+
+        expected = list(products.order_by('-rank', 'id').values_list('id', flat=True))
+        self.assertEqual(len(expected), 13)
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 4)
+
+        # Geri giderken de aynı sayfa gelir
+        previous = paginator.page(page.previous_cursor)
+        self.assertEqual([product.pk for product in previous], expected[8:12])
+
+    def test_cursor_from_another_ordering_starts_from_the_first_page(self):
+        products = Product.objects.filter(is_active=True)
+        cursor = KeysetPaginator(products, ('price', 'id'), per_page=4).page().next_cursor
+        newest = KeysetPaginator(products, ('-created_at', '-id'), per_page=4)
+        self.assertEqual([product.pk for product in newest.page(cursor)], [product.pk for product in newest.page()])
+
+        # Sayfalanan ürün listesinde de sıralama değişince 500 yerine ilk sayfa
+        response = self.client.get('/', {'sort': 'new', 'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['previous_url'])
+
+
+# Testlerde kullanılan görev: ilk iki denemede hata verir
+flaky_calls = []
+
+
+@task('test.flaky', max_attempts=3)
+def flaky(value):
+    flaky_calls.append(value)
+    if len(flaky_calls) < 3:
+        raise RuntimeError("geçici hata")
+
+
+@task('test.stolen')
+def stolen(slug):
+    Category.objects.create(name=slug, slug=slug)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        flaky_calls.clear()
+
+    def run_due(self):
+        Job.objects.filter(status=Job.PENDING).update(run_at=timezone.now())
+        return run_pending()
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = enqueue('test.flaky', {'value': 1})
+
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('geçici hata', job.last_error)
+        self.assertEqual(run_pending(), 0)  # Bekleme süresi dolmadan tekrar denenmez
+
+        self.run_due()
+        self.run_due()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 3))
+
+    def test_lost_lease_rolls_back_the_work(self):
+        enqueue('test.stolen', {'slug': 'yarim'})
+        [job] = claim()
+        # İş sürerken LEASE doldu ve başka bir işçi işi aldı
+        Job.objects.filter(pk=job.pk).update(locked_by='baska-isci')
+
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertFalse(Category.objects.filter(slug='yarim').exists())
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.RUNNING, 'baska-isci', 0))
+
+    def test_dedupe_key_enqueues_once(self):
+        first = enqueue('test.flaky', {'value': 1}, dedupe_key='flaky:1')
+        second = enqueue('test.flaky', {'value': 2}, dedupe_key='flaky:1')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_checkout_enqueues_followups(self):
+        user = User.objects.create_user('alici', password='x', email='alici@example.com')
+        product = make_product(Category.objects.create(name='Bakım', slug='bakim'), 'krem', stock=3)
+        order = place_order(user, make_cart(user, {product: 1}), ip_address='10.0.0.1')
+
+        self.assertFalse(UserActivityLog.objects.exists())
+        self.assertEqual(run_pending(), 3)
+        log = UserActivityLog.objects.get()
+        self.assertEqual((log.action, log.ip_address), ('ORDER', '10.0.0.1'))
+        self.assertIn(str(order.pk), log.description)
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+
+@sync_audit_log
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alici', password='x')
+        self.product = make_product(Category.objects.create(name='Bebek', slug='bebek'), 'mama', stock=5)
+        self.client.force_login(self.user)
+
+    def test_replayed_add_to_cart_adds_once(self):
+        url = f'/add-to-cart/{self.product.pk}/?key=abcdef123456'
+        first = self.client.get(url)
+        second = self.client.get(url)
+
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(CartItem.objects.get().quantity, 1)
+
+        # Yeni anahtar yeni bir işlem
+        self.client.get(f'/add-to-cart/{self.product.pk}/?key=zyxwvu654321')
+        self.assertEqual(CartItem.objects.get().quantity, 2)
+
+    def test_replayed_checkout_creates_one_order(self):
+        self.client.get(f'/add-to-cart/{self.product.pk}/')
+        self.client.get('/checkout/?key=checkout-key-1')
+        with self.assertNumQueries(3):  # oturum, kullanıcı, anahtar
+            response = self.client.get('/checkout/?key=checkout-key-1')
+        self.assertEqual(response['Location'], '/order-success/')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_prefetch_does_not_mutate(self):
+        self.client.get(f'/add-to-cart/{self.product.pk}/', HTTP_SEC_PURPOSE='prefetch')
+        self.assertFalse(CartItem.objects.exists())
+
+
+@sync_audit_log
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alici', password='x')
+        category = Category.objects.create(name='Vitamin', slug='vitamin')
+        products = [make_product(category, f'urun-{index}', stock=10) for index in range(4)]
+        for index in range(3):
+            buy(self.user, {product: index + 1 for product in products})
+        self.client.force_login(self.user)
+
+    def test_checkout_writes_summary_columns(self):
+        order = Order.objects.latest('id')
+        self.assertEqual(order.item_count, 12)
+        self.assertEqual(order.summary, 'URUN-0 x3, URUN-1 x3, URUN-2 x3, URUN-3 x3')
+        # Uzun listeler sütuna sığacak kadar kısaltılır
+        long_summary = order_summary([('Ü' * 100, 1)] * 4)
+        self.assertTrue(long_summary.endswith(' ve 2 ürün daha'))
+        self.assertLessEqual(len(long_summary), ORDER_SUMMARY_LENGTH)
+
+    def test_collapsed_history_does_not_load_items(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/my-orders/')
+        self.assertContains(response, 'URUN-0 x2, URUN-1 x2')
+        self.assertFalse(any(OrderItem._meta.db_table in query['sql'] for query in queries))
+
+    def test_details_are_prefetched_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/my-orders/?details=1')
+        self.assertContains(response, '<td>URUN-3</td>', count=3)
+        item_queries = [query for query in queries if OrderItem._meta.db_table in query['sql']]
+        self.assertEqual(len(item_queries), 1)
+
+
+@sync_audit_log
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Vitamin', slug='vitamin')
+        self.product = make_product(self.category, 'c-vitamini', stock=100, price='5.00')
+        self.users = [User.objects.create_user(f'alici{index}', password='x') for index in range(2)]
+
+    def test_incremental_refresh_recomputes_touched_days(self):
+        buy(self.users[0], {self.product: 2}, ago=timedelta(days=1, hours=1))
+        buy(self.users[0], {self.product: 1}, ago=timedelta(hours=1))
+        self.assertEqual(refresh(), 2)
+
+        latest = buy(self.users[1], {self.product: 3}, ago=timedelta(hours=1))
+        self.assertEqual(refresh(), 1)  # Sadece bugün yeniden hesaplanır
+        self.assertEqual(refresh(), 0)
+        self.assertEqual(RollupCheckpoint.objects.get().position, latest.pk)
+
+        today = ProductSalesDaily.objects.get(day=timezone.localdate())
+        self.assertEqual((today.units, today.revenue, today.buyers), (4, Decimal('20.00'), 2))
+        self.assertEqual(CategorySalesDaily.objects.get(day=timezone.localdate()).units, 4)
+        self.assertEqual(ProductSalesDaily.objects.count(), 2)
+
+    def test_recent_orders_wait_for_safety_lag(self):
+        buy(self.users[0], {self.product: 1})
+        self.assertEqual(refresh(), 0)
+        self.assertFalse(ProductSalesDaily.objects.exists())
+
+    def test_dashboard_reads_rollups_only(self):
+        buy(self.users[0], {self.product: 2}, ago=timedelta(hours=1))
+        refresh()
+        self.client.force_login(User.objects.create_superuser('yonetici', password='x'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/store/productsalesdaily/?days=7')
+        self.assertContains(response, 'C-VITAMINI')
+        self.assertFalse(any(OrderItem._meta.db_table in query['sql'] for query in queries))
+
+
+class ProductPairTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Bakım', slug='bakim')
+        self.shampoo, self.conditioner, self.comb = (
+            make_product(category, slug, stock=100) for slug in ('sampuan', 'krem', 'tarak')
+        )
+        self.user = User.objects.create_user('alici', password='x')
+
+    def test_incremental_refresh_matches_full_rebuild(self):
+        buy(self.user, {self.shampoo: 1, self.conditioner: 1}, ago=timedelta(hours=1))
+        buy(self.user, {self.shampoo: 1, self.conditioner: 1, self.comb: 1}, ago=timedelta(hours=1))
+        refresh_pairs()
+        buy(self.user, {self.shampoo: 1, self.comb: 1}, ago=timedelta(hours=1))
+        buy(self.user, {self.shampoo: 1, self.comb: 1}, ago=timedelta(hours=1))
+        self.assertEqual(refresh_pairs(), 2)  # Sadece yeni siparişlerdeki ürünler
+
+        incremental = set(ProductPair.objects.values_list('product', 'related', 'count'))
+        rebuild_pairs()
+        self.assertEqual(set(ProductPair.objects.values_list('product', 'related', 'count')), incremental)
+
+        with self.assertNumQueries(1):
+            related = bought_together(self.shampoo.pk)
+        self.assertEqual(related, [self.comb, self.conditioner])
+
+    def test_counter_keeps_memory_bounded(self):
+        counter = PairCounter(limit=2)
+        for related in range(2, 50):
+            counter.add_order({1, related})
+        counter.add_order({1, 2})
+        self.assertLessEqual(len(counter.counts[1]), 4)
+        self.assertEqual(list(counter.top(1, 1)), [2])
+
+
+class PopularityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Vitamin', slug='vitamin')
+        self.old_hit, self.new_hit = make_product(category, 'eski', stock=50), make_product(category, 'yeni', stock=50)
+        self.user = User.objects.create_user('alici', password='x')
+
+    def test_scores_decay_and_match_rebuild(self):
+        # 10 gün önce 6 adet, bugün 2 adet: uzun vadede eski önde, kısa vadede yeni
+        buy(self.user, {self.old_hit: 6}, ago=timedelta(days=10))
+        buy(self.user, {self.new_hit: 2}, ago=timedelta())
+        buy(self.user, {self.new_hit: 1}, ago=timedelta())
+        run_pending()
+
+        self.assertEqual(popular_products(BESTSELLER), [self.old_hit, self.new_hit])
+        self.assertEqual(popular_products(TRENDING), [self.new_hit, self.old_hit])
+
+        incremental = {row.pk: (row.bestseller, row.trending) for row in ProductPopularity.objects.all()}
+        rebuild_popularity()
+        for row in ProductPopularity.objects.all():
+            self.assertAlmostEqual(row.bestseller, incremental[row.pk][0], places=6)
+            self.assertAlmostEqual(row.trending, incremental[row.pk][1], places=6)
+
+    def test_product_list_reads_strips_from_cache(self):
+        buy(self.user, {self.new_hit: 1}, ago=timedelta())
+        run_pending()
+        self.client.get('/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertContains(response, 'Çok Satanlar')
+        self.assertFalse(any(ProductPopularity._meta.db_table in query['sql'] for query in queries))
+
+
+@sync_audit_log
+class PurchasedProductTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Vitamin', slug='vitamin')
+        self.bought, self.other = make_product(category, 'c-vitamini', stock=10), make_product(category, 'cinko', stock=10)
+        self.user = User.objects.create_user('alici', password='x')
+        self.client.force_login(self.user)
+
+    def review(self, product):
+        return self.client.post(f'/submit_review/{product.pk}/', {'subject': 'İyi', 'review': 'Memnunum', 'rating': 5},
+                                HTTP_REFERER=f'/vitamin/{product.slug}/')
+
+    def test_checkout_records_each_purchase_once(self):
+        self.assertEqual(purchased_product_ids(self.user.pk), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            buy(self.user, {self.bought: 1})
+            buy(self.user, {self.bought: 1})
+        self.assertEqual(PurchasedProduct.objects.count(), 1)
+        # Sipariş commit olunca kullanıcının kümesi yenilenir
+        self.assertEqual(purchased_product_ids(self.user.pk), {self.bought.pk})
+
+    def test_only_buyers_can_review(self):
+        buy(self.user, {self.bought: 1})
+        self.review(self.bought)
+        self.review(self.other)
+        self.assertEqual(list(Review.objects.values_list('product', flat=True)), [self.bought.pk])
+
+    def test_stale_cached_set_falls_back_to_table(self):
+        purchased_product_ids(self.user.pk)  # boş küme önbellekte
+        PurchasedProduct.objects.create(user=self.user, product=self.bought)
+        self.assertTrue(has_purchased(self.user.pk, self.bought.pk))
+        self.assertEqual(purchased_product_ids(self.user.pk), {self.bought.pk})
+
+    def test_detail_page_sees_purchase_despite_stale_cached_set(self):
+        purchased_product_ids(self.user.pk)  # başka bir süreçte önbelleğe alınmış boş küme gibi
+        PurchasedProduct.objects.create(user=self.user, product=self.bought)
+        response = self.client.get(f'/vitamin/{self.bought.slug}/')
+        self.assertTrue(response.context['user_bought'])
+        self.assertFalse(self.client.get(f'/vitamin/{self.other.slug}/').context['user_bought'])
+
+    def test_order_history_lists_unreviewed_purchases(self):
+        buy(self.user, {self.bought: 1})
+        buy(self.user, {self.other: 1})
+        self.review(self.bought)
+        response = self.client.get('/my-orders/')
+        self.assertEqual(response.context['reviewable'], [self.other])
+
+
+class AuditLogWriterTests(TransactionTestCase):
+    def event(self, action='LOGIN', at=None):
+        return {'user_id': None, 'action': action, 'description': action, 'ip_address': '10.0.0.1',
+                'timestamp': (at or timezone.now()).isoformat()}
+
+    def wait_for(self, count):
+        deadline = time.monotonic() + 5
+        while UserActivityLog.objects.count() < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return UserActivityLog.objects.count()
+
+    def test_flushes_when_batch_is_full(self):
+        writer = AuditLogWriter(batch_size=3, flush_interval_ms=60000)
+        for _ in range(2):
+            writer.add(self.event())
+        time.sleep(0.1)
+        self.assertEqual(UserActivityLog.objects.count(), 0)
+        writer.add(self.event())
+        self.assertEqual(self.wait_for(3), 3)
+        writer.close()
+
+    def test_flushes_after_interval_and_keeps_event_time(self):
+        at = timezone.now() - timedelta(minutes=5)
+        writer = AuditLogWriter(batch_size=100, flush_interval_ms=50)
+        writer.add(self.event(at=at))
+        self.assertEqual(self.wait_for(1), 1)
+        self.assertEqual(UserActivityLog.objects.get().timestamp, at)
+        writer.close()
+
+    def test_close_flushes_buffer_and_spool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = AuditLogWriter(batch_size=100, flush_interval_ms=60000, spool_dir=directory)
+            writer.add(self.event('LOGIN'))
+            writer.add(self.event('LOGOUT'))
+            # Olaylar tampondayken diskte de duruyor
+            with open(writer.spool.path, encoding='utf-8') as spool:
+                self.assertEqual(len(spool.readlines()), 2)
+            writer.close()
+            self.assertEqual(UserActivityLog.objects.count(), 2)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_recovers_spool_of_crashed_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Yaşamayan bir sürecin dosyası, son satırı yarım kalmış
+            with open(os.path.join(directory, 'audit-999999999-dead.jsonl.1'), 'w', encoding='utf-8') as spool:
+                spool.write(json.dumps(self.event('LOGIN')) + '\n' + '{"user_id": nu')
+            self.assertEqual(recover_spool(directory), 1)
+            self.assertEqual(UserActivityLog.objects.get().action, 'LOGIN')
+            self.assertEqual(os.listdir(directory), [])
+
+    @skipUnless(os.path.exists('/proc/self/stat'), "Süreç başlama zamanı /proc'tan okunuyor")
+    def test_reused_pid_does_not_hide_a_crashed_spool(self):
+        parent = os.getppid()
+        with tempfile.TemporaryDirectory() as directory:
+            # Pid'i yaşayan ama başka bir sürece ait (başlama zamanı tutmuyor) dosya aktarılır,
+            # gerçekten yaşayan sürecin dosyasına dokunulmaz
+            for start, action in (('1', 'LOGIN'), (_process_start(parent), 'LOGOUT')):
+                with open(os.path.join(directory, f'audit-{parent}-{start}-abcd1234.jsonl'), 'w', encoding='utf-8') as spool:
+                    spool.write(json.dumps(self.event(action)) + '\n')
+            self.assertEqual(recover_spool(directory), 1)
+            self.assertEqual(UserActivityLog.objects.get().action, 'LOGIN')
+            self.assertEqual(os.listdir(directory), [f'audit-{parent}-{_process_start(parent)}-abcd1234.jsonl'])
+
+
+# Aynı ürünü aynı anda çok sayıda alıcı satın almaya çalışıyor: stok asla eksiye düşmemeli,
+# satılan toplam adet başlangıç stoğunu geçmemeli.
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentCheckoutTests(TransactionTestCase):
+    BUYERS = 12
+    STOCK = 5
+
+    def test_no_oversell_under_concurrent_checkouts(self):
+        category = Category.objects.create(name='Kampanya', slug='kampanya')
+        product = make_product(category, 'maske', stock=self.STOCK)
+        other = make_product(category, 'kolonya', stock=self.BUYERS * 2)
+        carts = []
+        for index in range(self.BUYERS):
+            user = User.objects.create_user(f'alici{index}', password='x')
+            # Yarısı ürünleri ters sırada sepete koymuş gibi (kilit sırası yine id'ye göre)
+            quantities = {product: 1, other: 2} if index % 2 else {other: 2, product: 1}
+            carts.append((user, make_cart(user, quantities)))
+
+        barrier = threading.Barrier(self.BUYERS)
+        results = []
+
+        def checkout(user, cart):
+            try:
+                barrier.wait()
+                place_order(user, cart)
+                results.append('ok')
+            except OutOfStock:
+                results.append('out')
+            except OperationalError:
+                # SQLite gibi tablo kilitli veritabanlarında meşgul hatası; sipariş oluşmamış sayılır
+                results.append('busy')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=pair) for pair in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        other.refresh_from_db()
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        orders = results.count('ok')
+
+        self.assertGreaterEqual(product.stock, 0)
+        self.assertLessEqual(sold, self.STOCK)
+        self.assertEqual(sold + product.stock, self.STOCK)
+        self.assertEqual(Order.objects.count(), orders)
+        self.assertEqual(other.stock, self.BUYERS * 2 - 2 * orders)
+        self.assertGreater(orders, 0)
+
+    def test_concurrent_batch_adds_never_reserve_above_stock(self):
+        category = Category.objects.create(name='Kampanya', slug='kampanya')
+        product = make_product(category, 'maske', stock=self.STOCK)
+        carts = [make_cart(User.objects.create_user(f'alici{index}', password='x'), {}) for index in range(self.BUYERS)]
+        barrier = threading.Barrier(self.BUYERS)
+
+        def fill(cart):
+            try:
+                barrier.wait()
+                add_many(cart, {product.pk: 2})
+            except OperationalError:
+                pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=fill, args=(cart,)) for cart in carts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        held = StockReservation.objects.filter(product=product).aggregate(total=Sum('quantity'))['total']
+        self.assertLessEqual(product.reserved, product.stock)
+        self.assertEqual(product.reserved, held)
+        self.assertEqual(CartItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'], held)
+
+    def test_concurrent_adds_share_one_line(self):
+        category = Category.objects.create(name='Kampanya', slug='kampanya')
+        product = make_product(category, 'maske', stock=self.BUYERS)
+        cart = make_cart(User.objects.create_user('alici', password='x'), {})
+        barrier = threading.Barrier(self.BUYERS)
+        results = []
+
+        def add():
+            try:
+                barrier.wait()
+                results.append(add_one(cart, product.pk))
+            except OperationalError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add) for _ in range(self.BUYERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(list(CartItem.objects.filter(cart=cart).values_list('quantity', flat=True)), [results.count(True)])
+        product.refresh_from_db()
+        self.assertEqual(product.reserved, results.count(True))
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # 1. Ana Sayfa
@@ -12,11 +12,20 @@ urlpatterns = [
     path('cart/', views.cart_detail, name='cart_detail'),
     path('add-to-cart/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('remove-from-cart/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/batch/', views.cart_batch, name='cart_batch'),
     path('checkout/', views.checkout, name='checkout'),
     path('order-success/', views.order_success, name='order_success'),
     path('my-orders/', views.order_history, name='order_history'),
+    path('my-orders/<int:order_id>/reorder/', views.reorder, name='reorder'),
     path('register/', views.register, name='register'),
     path('submit_review/<int:product_id>/', views.submit_review, name='submit_review'),
+    path('suggest/', views.search_suggest, name='search_suggest'),
+    path('reviews/<int:product_id>/', views.review_feed, name='review_feed'),
+
+    # JSON Katalog API (salt okunur, ETag / Last-Modified destekli)
+    path('api/products/', api.product_list, name='api_product_list'),
+    path('api/products/<int:product_id>/', api.product_detail, name='api_product_detail'),
+    path('api/categories/', api.category_list, name='api_category_list'),
 
     # 4. Ürün Detay Sayfası (DİKKAT: En sona koyduk ve İKİ parametre alıyor)
     path('<slug:category_slug>/<slug:product_slug>/', views.product_detail, name='product_detail'),
@@ -1,19 +1,48 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Q 
+from django.http import JsonResponse
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef, Prefetch, Sum
+from django.db.models.functions import Left
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Category, Product, Cart, CartItem, Order, OrderItem, UserActivityLog, Review
+from django.views.decorators.http import require_POST
+from .models import Category, Product, Cart, CartItem, Order, OrderItem, PurchasedProduct, Review
 from .forms import ReviewForm , RegisterForm
-
-
-def _cart_id(request):
-    cart = request.session.session_key
-    if not cart:
-        request.session.create()  # Oturumu oluştur
-        cart = request.session.session_key  # Şimdi anahtarı al
-    return cart
+from .cart import (
+    CartOperationError, SessionCart, add_many, add_one, apply_operations, cart_lines,
+    get_or_create_user_cart, get_user_cart, user_carts,
+)
+from .audit import log_activity
+from .cache import (
+    CATALOG_VERSION, CATEGORY_VERSION, FRAGMENT_TIMEOUT, PRODUCT_DATA_VERSION, PRODUCT_DETAIL_KEY, PRODUCT_DETAIL_TIMEOUT,
+    get_versions, product_version_name, product_versions,
+)
+from .checkout import EmptyCart, OutOfStock, place_order
+from .facets import FacetFilters, facet_counts
+from .idempotency import idempotent
+from .pagination import KeysetPaginator
+from .pairs import bought_together
+from .popularity import BESTSELLER, TRENDING, popular_products
+from .purchases import has_purchased, reviewable_products
+from .reservations import release_holds
+from .search import search_products
+from .suggest import prefix_index
+
+
+# Oturum sepetindeki satırı şablonda CartItem gibi gösterebilmek için
+class SessionCartItem:
+    def __init__(self, product, quantity):
+        self.id = product.id
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def total_price(self):
+        return self.product.price * self.quantity
 
 # --- YARDIMCI FONKSİYON: IP ADRESİ BULMA ---
 def get_client_ip(request):
@@ -25,29 +54,116 @@ def get_client_ip(request):
     return ip
 
 # 1. Ana Sayfa (Ürün Listesi + Kategori Filtreleme + Arama)
+PRODUCTS_PER_PAGE = 24
+
+# Sıralama seçenekleri -> keyset sayfalama için sıralama alanları (son alan hep id)
+PRODUCT_SORTS = {
+    'new': ('-created_at', '-id'),
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+}
+
+# Ürün kartında gösterilen sütunlar (açıklamanın tamamını çekmeye gerek yok)
+PRODUCT_CARD_FIELDS = (
+    'id', 'name', 'slug', 'price', 'stock', 'reserved', 'image', 'created_at',
+    'category__id', 'category__slug',
+)
+
+
 def product_list(request, category_slug=None):
     category = None
-    categories = Category.objects.all() 
+    categories = Category.objects.all()  # Menü önbellekteyse sorgu hiç çalışmaz
     products = Product.objects.filter(is_active=True)
 
     if category_slug:
         category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=category)
 
     search_query = request.GET.get('q')
+    sort = request.GET.get('sort')
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) | Q(description__icontains=search_query)
-        )
+        # Tam metin arama + trigram (bkz. store/search.py)
+        products = search_products(products, search_query)
+        if sort not in PRODUCT_SORTS:
+            sort = 'relevance'
+    elif sort not in PRODUCT_SORTS:
+        sort = 'new'
+
+    # Filtre adetleri (kategori / fiyat aralığı / stok) tek sorguda, bkz. store/facets.py
+    filters = FacetFilters.from_request(request)
+    facets = facet_counts(products, filters, category, search_query)
+    products = filters.apply(products)
+    if category:
+        products = products.filter(category=category)
+
+    ordering = ('-rank', 'id') if sort == 'relevance' else PRODUCT_SORTS[sort]
+
+    # Sayfa başına sabit sorgu: kategoriyle tek JOIN, sadece kart sütunları, N+1 yok
+    products = products.select_related('category').only(*PRODUCT_CARD_FIELDS).annotate(
+        short_description=Left('description', 41),
+    )
+    page = KeysetPaginator(products, ordering, per_page=PRODUCTS_PER_PAGE).page(request.GET.get('cursor'))
+
+    # Çok satanlar / popüler şeritleri: sadece ilk sayfada, aramada değil. Önbellekten tek okuma
+    # (bkz. store/popularity.py)
+    bestsellers = trending = None
+    if not search_query and not request.GET.get('cursor'):
+        category_id = category.pk if category else None
+        bestsellers = popular_products(BESTSELLER, category_id)
+        trending = popular_products(TRENDING, category_id)
 
     context = {
-        'products': products,
+        'products': page,
+        'page': page,
         'categories': categories,
         'category': category,
-        'search_query': search_query
+        'search_query': search_query,
+        'sort': sort,
+        'next_url': _page_url(request, page.next_cursor),
+        'previous_url': _page_url(request, page.previous_cursor),
+        # Kart ve menü parça önbelleği anahtarları (kartlar ürün başına sürümle)
+        'versions': get_versions(CATALOG_VERSION, CATEGORY_VERSION, PRODUCT_DATA_VERSION),
+        'card_versions': product_versions([product.pk for product in page]),
+        'fragment_timeout': FRAGMENT_TIMEOUT,
+        'facets': facets,
+        'filters': filters,
+        'filter_query': _filter_url(request)[len(request.path) + 1:],
+        'price_links': [
+            (label, count, key == filters.price, _filter_url(request, price=None if key == filters.price else key))
+            for key, label, count in facets['bands']
+        ],
+        'stock_link': _filter_url(request, stock=None if filters.in_stock else '1'),
+        'bestsellers': bestsellers,
+        'trending': trending,
     }
     return render(request, 'store/product_list.html', context)
 
+
+# Filtre linki: mevcut parametreleri koru, verilenleri değiştir (None ise kaldır),
+# imleci sıfırla (filtre değişince ilk sayfadan başlanır)
+def _filter_url(request, **changes):
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    for name, value in changes.items():
+        if value is None:
+            params.pop(name, None)
+        else:
+            params[name] = value
+    return f"{request.path}?{params.urlencode()}"
+
+
+# Arama kutusu önerileri (bellek içi önek indeksi, veritabanına gitmez)
+def search_suggest(request):
+    return JsonResponse({'suggestions': prefix_index.suggest(request.GET.get('q', ''))})
+
+
+# Mevcut filtreleri (q, sort) koruyarak imleçli sayfa linki üret
+def _page_url(request, cursor):
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f"{request.path}?{params.urlencode()}"
+
 # 2. Kayıt Olma (Loglama Eklendi)
 def register(request):
     if request.method == 'POST':
@@ -57,12 +173,7 @@ def register(request):
             
             # --- GÜVENLİK LOGU ---
             # Kayıt olan kullanıcıyı loglayalım
-            UserActivityLog.objects.create(
-                user=user,
-                action='REGISTER',
-                description="Kullanıcı sisteme kayıt oldu.",
-                ip_address=get_client_ip(request)
-            )
+            log_activity('REGISTER', "Kullanıcı sisteme kayıt oldu.", user=user, ip_address=get_client_ip(request))
             
             login(request, user) # Kayıt olunca otomatik giriş yapsın
             messages.success(request, "Aramıza hoşgeldin! Kayıt başarıyla tamamlandı.")
@@ -78,10 +189,14 @@ def register(request):
     return render(request, 'registration/register.html', context)
 
 # 3. Sepete Ekleme (Loglama Eklendi)
-@login_required(login_url='/accounts/login/')
+# Sabit sorgu sayısı: ürün, sepet, stok ayırma, tek bir upsert, rozet sayacı (bkz. store/cart.py)
+# Giriş yapmamış ziyaretçinin sepeti oturumda tutulur, giriş yapınca kalıcı sepete aktarılır.
+@idempotent('add_to_cart')
 def add_to_cart(request, product_id):
     current_user = request.user
-    product = get_object_or_404(Product, id=product_id)
+    product = get_object_or_404(Product.objects.select_related('category').only(
+        'id', 'slug', 'stock', 'reserved', 'category__slug',
+    ), id=product_id, is_active=True)
 
     # --- 1. STOK KONTROLÜ (Stok yoksa Ürün Sayfasında Kal) ---
     if product.stock <= 0:
@@ -90,54 +205,46 @@ def add_to_cart(request, product_id):
         return redirect('product_detail', category_slug=product.category.slug, product_slug=product.slug)
 
     # --- 2. SEPET MANTIĞI ---
-    try:
-        # Sepeti bulmaya çalış, yoksa oluştur
-        cart = Cart.objects.get(cart_id=_cart_id(request))
-    except Cart.DoesNotExist:
-        cart = Cart.objects.create(cart_id=_cart_id(request))
-        cart.save()
+    if current_user.is_authenticated:
+        # Adet stoğu ayırarak ekleniyor; satılabilir adet kalmadıysa eklenmiyor (bkz. store/reservations.py)
+        added = add_one(get_or_create_user_cart(request), product.id)
+    else:
+        added = SessionCart(request.session).add(product)
 
-    try:
-        cart_item = CartItem.objects.get(product=product, cart=cart)
-        # Stoktan fazla eklemeyi engelle
-        if cart_item.quantity < product.stock:
-            cart_item.quantity += 1
-            cart_item.save()
-            messages.success(request, 'Ürün sepete eklendi.')
-        else:
-            messages.warning(request, 'Stoktaki tüm ürünleri zaten eklediniz.')
-            
-    except CartItem.DoesNotExist:
-        cart_item = CartItem.objects.create(
-            product=product,
-            quantity=1,
-            cart=cart
-        )
-        cart_item.save()
+    if added:
         messages.success(request, 'Ürün sepete eklendi.')
+    else:
+        messages.warning(request, 'Bu üründen şu an sepete eklenebilecek adet kalmadı.')
     
     # İşlem başarılıysa SEPETİM sayfasına git
     return redirect('cart_detail')
 
 # 4. Sepet Detayı
-@login_required(login_url='/accounts/login/')
+# Üye sepeti: satırlar, satır tutarları ve toplamlar tek sorguda (bkz. cart_lines)
 def cart_detail(request, total=0, quantity=0, cart_items=None):
-    try:
+    if request.user.is_authenticated:
         # 1. Sepeti Bul
-        cart = Cart.objects.get(cart_id=_cart_id(request))
-        
-        # 2. Sepetteki Ürünleri Getir 
-        # (DÜZELTME: is_active=True kısmını kaldırdık çünkü CartItem modelinde böyle bir alan yok)
-        cart_items = CartItem.objects.filter(cart=cart)
+        cart = get_user_cart(request.user)
         
-        # 3. Toplam Fiyat ve Adet Hesapla
-        for cart_item in cart_items:
-            total += (cart_item.product.price * cart_item.quantity)
-            quantity += cart_item.quantity
-
-    except Cart.DoesNotExist: 
-        # (DÜZELTME: ObjectDoesNotExist yerine Cart.DoesNotExist kullandık, import gerekmez)
-        pass 
+        # 2. Sepetteki Ürünleri ve Toplamları Getir
+        if cart:
+            cart_items = list(cart_lines(cart))
+            if cart_items:
+                total = cart_items[0].cart_total
+                quantity = cart_items[0].cart_quantity
+    else:
+        # Ziyaretçi: oturumdaki sepet (veritabanında sepet yok)
+        session_cart = SessionCart(request.session)
+        if session_cart:
+            quantities = session_cart.quantities()
+            cart_items = [
+                SessionCartItem(product, quantities[product.id])
+                for product in Product.objects.filter(pk__in=quantities).only('id', 'name', 'price', 'image')
+            ]
+            # 3. Toplam Fiyat ve Adet Hesapla (satırlar zaten bellekte)
+            for cart_item in cart_items:
+                total += cart_item.total_price
+                quantity += cart_item.quantity
 
     context = {
         'total': total,
@@ -147,68 +254,77 @@ def cart_detail(request, total=0, quantity=0, cart_items=None):
     return render(request, 'store/cart_detail.html', context)
 
 # 5. Sepetten Silme (Loglama Eklendi)
-@login_required(login_url='/accounts/login/')
+# Ziyaretçi sepetinde satır id'si yok; orada item_id ürün id'si anlamına geliyor.
+@idempotent('remove_from_cart')
 def remove_from_cart(request, item_id):
+    if not request.user.is_authenticated:
+        SessionCart(request.session).remove(item_id)
+        return redirect('cart_detail')
+
     cart_item = get_object_or_404(CartItem, id=item_id)
     
     # Güvenlik Kontrolü
     if cart_item.cart.user == request.user:
         product_name = cart_item.product.name # Silmeden önce ismini alalım
         cart_item.delete()
+        cart_item.cart.adjust_item_count(-cart_item.quantity)
+        release_holds([cart_item.cart_id], [cart_item.product_id])
         
         # --- LOG EKLE ---
-        UserActivityLog.objects.create(
-            user=request.user, 
-            action='REMOVE_CART', 
-            description=f"{product_name} sepetten silindi.", 
-            ip_address=get_client_ip(request)
-        )
+        log_activity('REMOVE_CART', f"{product_name} sepetten silindi.", user=request.user, ip_address=get_client_ip(request))
         
     return redirect('cart_detail')
 
-# 6. Ödeme (Checkout) ve Stok Düşme (Loglama Eklendi)
+# 5b. Toplu Sepet İşlemi (JSON)
+# Gövde: {"operations": [{"op": "add" | "set" | "remove", "product_id": 1, "quantity": 2}, ...]}
+# Tüm işlemler tek transaction içinde toplu upsert/delete ile uygulanır; yanıtta sepetin son hali döner.
+# İstemci Idempotency-Key başlığı gönderirse aynı istek tekrarlandığında ilk yanıt döner.
+MAX_CART_OPERATIONS = 100
+
+
+@require_POST
+@idempotent('cart_batch')
+def cart_batch(request):
+    try:
+        operations = json.loads(request.body)['operations']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Geçersiz istek gövdesi.'}, status=400)
+    if not isinstance(operations, list) or len(operations) > MAX_CART_OPERATIONS:
+        return JsonResponse({'error': 'Geçersiz işlem listesi.'}, status=400)
+
+    try:
+        if request.user.is_authenticated:
+            items = apply_operations(get_or_create_user_cart(request), operations)
+        else:
+            items = SessionCart(request.session).apply_operations(operations)
+    except CartOperationError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse({
+        'items': {str(product_id): quantity for product_id, quantity in items.items()},
+        'item_count': sum(items.values()),
+    })
+
+# 6. Ödeme (Checkout) ve Stok Düşme (Loglama arka planda)
 @login_required(login_url='/accounts/login/')
+@idempotent('checkout')
 def checkout(request):
-    cart = Cart.objects.filter(user=request.user).first()
-    
-    if not cart or not cart.items.exists():
+    cart = get_user_cart(request.user)
+
+    # Stok düşme, sipariş satırları ve sepeti boşaltma tek transaction içinde (bkz. store/checkout.py)
+    try:
+        if cart is None:
+            raise EmptyCart()
+        order = place_order(request.user, cart, ip_address=get_client_ip(request))
+    except EmptyCart:
         messages.error(request, "Sepetiniz boş.")
         return redirect('product_list')
-
-    # Sipariş Kaydı
-    order = Order.objects.create(user=request.user, total_price=0)
-    final_total = 0
-
-    for item in cart.items.all():
-        if item.product.stock >= item.quantity:
-            item.product.stock -= item.quantity
-            item.product.save()
-            
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.price
-            )
-            final_total += item.total_price
-        else:
-            order.delete()
-            messages.error(request, f"{item.product.name} için yeterli stok kalmadı.")
-            return redirect('cart_detail')
-    
-    order.total_price = final_total
-    order.save()
-    
-    cart.items.all().delete()
-    
-    # --- LOG EKLE ---
-    UserActivityLog.objects.create(
-        user=request.user, 
-        action='ORDER', 
-        description=f"Sipariş verildi. Tutar: {order.total_price} TL. Sipariş ID: {order.id}", 
-        ip_address=get_client_ip(request)
-    )
+    except OutOfStock as error:
+        names = ', '.join(error.products)
+        messages.error(request, f"{names} için yeterli stok kalmadı." if names else "Yeterli stok kalmadı.")
+        return redirect('cart_detail')
     
+    # Log ve onay e-postası arka planda (store/tasks.py, run_jobs işçisi)
     messages.success(request, f"Siparişiniz alındı! Sipariş No: #{order.id}")
     return redirect('order_success')
 
@@ -217,46 +333,167 @@ def order_success(request):
     return render(request, 'store/order_success.html')
 
 # 8. Sipariş Geçmişi
+# Özet liste (varsayılan) sadece Order satırlarını okur: adet ve özet sipariş anında yazılıyor.
+# "Detayları göster" açıkken sayfadaki siparişlerin satırları tek bir prefetch sorgusuyla gelir.
+ORDERS_PER_PAGE = 10
+
+
 @login_required(login_url='/accounts/login/')
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'store/order_history.html', {'orders': orders})
+    orders = Order.objects.filter(user=request.user).only(
+        'id', 'user_id', 'created_at', 'total_price', 'item_count', 'summary',
+    )
+    show_details = request.GET.get('details') == '1'
+    if show_details:
+        orders = orders.prefetch_related(Prefetch(
+            'items',
+            queryset=OrderItem.objects.select_related('product').only(
+                'id', 'order_id', 'quantity', 'price', 'product__id', 'product__name',
+            ).annotate(line_total=F('price') * F('quantity')).order_by('id'),
+        ))
+
+    page = KeysetPaginator(orders, ('-created_at', '-id'), per_page=ORDERS_PER_PAGE).page(request.GET.get('cursor'))
+
+    # Detay aç/kapa aynı sayfada kalsın (imleç korunuyor)
+    params = request.GET.copy()
+    if show_details:
+        params.pop('details', None)
+    else:
+        params['details'] = '1'
 
-# store/views.py içindeki product_detail fonksiyonu TAM OLARAK böyle olmalı:
+    context = {
+        'orders': page,
+        'show_details': show_details,
+        'details_url': f"{request.path}?{params.urlencode()}",
+        'next_url': _page_url(request, page.next_cursor) if page.has_next else None,
+        'previous_url': _page_url(request, page.previous_cursor) if page.has_previous else None,
+        # Satın alınıp henüz yorumlanmamış ürünler (sadece ilk sayfada)
+        'reviewable': [] if request.GET.get('cursor') else reviewable_products(request.user),
+    }
+    return render(request, 'store/order_history.html', context)
 
-def product_detail(request, category_slug, product_slug):
-    # 1. Ürünü Bul
-    product = get_object_or_404(Product, category__slug=category_slug, slug=product_slug)
+# 8b. Tekrar Sipariş Ver: siparişteki ürünleri (stokla sınırlı) sepete ekle.
+# Sabit sorgu sayısı: sipariş kalemleri (tek GROUP BY), sepet, tek upsert, rozet sayacı.
+@login_required(login_url='/accounts/login/')
+@require_POST
+@idempotent('reorder')
+def reorder(request, order_id):
+    quantities = dict(
+        OrderItem.objects.filter(order_id=order_id, order__user=request.user, product__is_active=True)
+        .values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+    if not quantities:
+        messages.warning(request, 'Bu siparişteki ürünler artık satışta değil.')
+        return redirect('order_history')
 
-    # 2. Sepet Kontrolü (Hata vermeyen yöntem)
-    in_cart = False
-    try:
-        # Cart ID'ye göre sepeti bul
-        cart = Cart.objects.get(cart_id=_cart_id(request))
-        # Ürün sepette mi?
-        in_cart = CartItem.objects.filter(cart=cart, product=product).exists()
-    except Cart.DoesNotExist:
-        in_cart = False
+    add_many(get_or_create_user_cart(request), quantities)
+    messages.success(request, f"#{order_id} numaralı siparişin ürünleri sepete eklendi (stok durumuna göre).")
+    return redirect('cart_detail')
+
+# 9. Ürün Detay
+# Herkes için aynı olan kısım (ürün, kategori, onaylı yorumlar + yazarları, puan özeti)
+# ürün başına önbellekte tutulur. Ürün ya da yorumları değişince sürüm artar ve
+# bir sonraki istekte yeniden üretilir (bkz. store/signals.py).
+def _product_detail_payload(category_slug, product_slug):
+    key = PRODUCT_DETAIL_KEY.format(category_slug, product_slug)
+    payload = cache.get(key)
+    if payload is not None:
+        current = get_versions(product_version_name(payload['product'].pk), CATEGORY_VERSION)
+        if payload['versions'] == current:
+            return payload
+
+    product = get_object_or_404(
+        Product.objects.select_related('category'), category__slug=category_slug, slug=product_slug,
+    )
+    versions = get_versions(product_version_name(product.pk), CATEGORY_VERSION)
+    # Sadece ilk yorum sayfası; devamı review_feed (JSON) ile imleçli geliyor
+    first_page = _review_paginator(product.pk, 'new').page()
+    payload = {
+        'product': product,
+        'reviews': first_page.object_list,
+        'reviews_next_cursor': first_page.next_cursor,
+        'review_count': product.rating_count,
+        'rating_average': product.rating_avg,
+        'versions': versions,
+    }
+    cache.set(key, payload, PRODUCT_DETAIL_TIMEOUT)
+    return payload
+
+
+# Yorum akışı: en yeni ya da en yüksek puanlı önce, (product, status, ...) indeksi üzerinde keyset
+REVIEWS_PER_PAGE = 10
 
-    # 3. Yorumları Getir
-    reviews = Review.objects.filter(product=product, status=True)
+REVIEW_SORTS = {
+    'new': ('-created_at', '-id'),
+    'rating': ('-rating', '-id'),
+}
 
-    # 4. Satın Alma ve Yorum Kontrolü
+
+def _review_paginator(product_id, sort):
+    reviews = (
+        Review.objects.filter(product_id=product_id, status=True)
+        .select_related('user')
+        .only('subject', 'review', 'rating', 'created_at', 'user__username')
+    )
+    return KeysetPaginator(reviews, REVIEW_SORTS[sort], per_page=REVIEWS_PER_PAGE)
+
+
+# "Daha fazla yorum" için hafif JSON uç noktası
+def review_feed(request, product_id):
+    sort = request.GET.get('sort')
+    if sort not in REVIEW_SORTS:
+        sort = 'new'
+    page = _review_paginator(product_id, sort).page(request.GET.get('cursor'))
+    return JsonResponse({
+        'reviews': [
+            {
+                'subject': review.subject,
+                'review': review.review,
+                'rating': review.rating,
+                'user': review.user.username,
+                'created_at': review.created_at.isoformat(),
+            }
+            for review in page
+        ],
+        'next': page.next_cursor,
+    })
+
+
+def product_detail(request, category_slug, product_slug):
+    payload = _product_detail_payload(category_slug, product_slug)
+    product = payload['product']
+
+    # Kullanıcıya özel kısım: sepette mi ve satın almış mı tek sorguda (iki EXISTS, satın alma
+    # tekil indeksten; önbellekteki küme başka süreçte eski kalmış olabilir), kendi yorumu ikinci sorguda
+    in_cart = False
     user_bought = False
     user_review = None
 
     if request.user.is_authenticated:
-        # Bu kullanıcı ürünü sipariş etmiş mi?
-        user_bought = OrderItem.objects.filter(order__user=request.user, product=product).exists()
+        carts = user_carts(request.user)[:1]
+        in_cart, user_bought = Product.objects.filter(pk=product.pk).values_list(
+            Exists(CartItem.objects.filter(cart__in=carts, product=OuterRef('pk'))),
+            Exists(PurchasedProduct.objects.filter(user=request.user, product=OuterRef('pk'))),
+        ).get()
+    else:
+        # Ziyaretçi sepeti oturumda; oturum yoksa (bot vb.) açmıyoruz
+        in_cart = product.pk in SessionCart(request.session)
+
+    if request.user.is_authenticated:
         # Daha önce yorum yapmış mı?
         user_review = Review.objects.filter(user=request.user, product=product).first()
 
     context = {
         'product': product,
         'in_cart': in_cart,
-        'reviews': reviews,
+        'reviews': payload['reviews'],
+        'reviews_next_cursor': payload['reviews_next_cursor'],
+        'review_count': payload['review_count'],
+        'rating_average': payload['rating_average'],
         'user_bought': user_bought,
         'user_review': user_review,
+        # Önceden hesaplanmış tablodan tek indeksli sorgu (bkz. store/pairs.py)
+        'bought_together': bought_together(product.pk),
     }
     return render(request, 'store/product_detail.html', context)
 
@@ -268,11 +505,8 @@ def submit_review(request, product_id):
         try:
             # --- GÜVENLİK KONTROLÜ BAŞLANGICI ---
             # Kullanıcı bu ürünü daha önce sipariş etmiş mi?
-            # OrderItem tablosunda bu kullanıcıya ait siparişlerde bu ürün var mı diye bakıyoruz.
-            has_bought = OrderItem.objects.filter(
-                order__user=request.user, 
-                product__id=product_id
-            ).exists()
+            # Satın alınan ürünler tablosuna (önbellekli küme, yoksa unique indeks) bakıyoruz.
+            has_bought = has_purchased(request.user.pk, product_id)
 
             if not has_bought:
                 messages.error(request, "Bu ürünü değerlendirmek için önce satın almalısınız.")